@@ -23,7 +23,12 @@ def anneal_solutuon(method = None):
     else:
         Q_init = np.load('files/Qfile.npz')
 
-    Q = Q_init['Q'].astype(np.float32)
+    # integer Q is saved with the scale, see save_Qmat
+    if 'scale' in Q_init:
+        Q = Q_init['Q'] / Q_init['scale']
+    else:
+        Q = Q_init['Q']
+    Q = Q.astype(np.float32)
     model = dimod.BinaryQuadraticModel(Q, "BINARY")
 
     # model = dimod.BinaryQuadraticModel.from_numpy_matrix(Q)
@@ -3,9 +3,12 @@
 import pickle as pk
 import os
 import numpy as np
+import scipy.sparse
 import dimod
 import pickle
-from railway_solvers import earliest_dep_time, indexing4qubo, make_Qubo, energy
+from railway_solvers import make_Qubo, energy, write_Qubo, QuboCache
+from railway_solvers import compile_problem, integer_scaled, unscaled, constraint_violations
+from railway_solvers import decode_timetables, qubo_index
 
 
 
@@ -15,22 +18,18 @@ def visualise_Qubo_solution(solution, Problem):
      solution is the vector of 1 and 0, where 1 means
      that given train leaves given station at given delay.
 
-     Problem is the object that encodes particular dispatching problem
+     Problem is the object that encodes particular dispatching problem,
+     if it is compiled (compile_problem) its earliest departures are reused,
+     see decode_timetables
      """
-    trains_paths = Problem.trains_paths
-    inds, q_bits = indexing4qubo(trains_paths, Problem.d_max)
-    print("n.o. x vars", q_bits)
+    table = decode_timetables(solution, Problem)
+    print("n.o. x vars", qubo_index(Problem).q_bits)
     print("n.o. all var", np.size(solution))
 
     print("------- output train timetable   ------")
 
-    for i in range(q_bits):
-        if solution[i] == 1:
-            j = inds[i]["j"]
-            s = inds[i]["s"]
-            d = inds[i]["d"]
-            t = d + earliest_dep_time(trains_paths["Paths"], Problem.trains_timing, j, s)
-            print("train", j, "station", s, "delay", d, "dep. time", t)
+    for j, s, d, t in zip(table["train"], table["station"], table["delay"], table["departure_time"]):
+        print("train", j, "station", s, "delay", d, "dep. time", t)
     print("--------------------------------------------------")
 
 
@@ -49,10 +48,10 @@ def load_train_solution(f, i):
 
     sorted = np.sort(sampleset.record, order="energy")
     solutions = [sol[0] for sol in sorted]
-    energies = [sol[1] for sol in sorted]
+    solution_energies = [sol[1] for sol in sorted]
     occurrences = [sol[2] for sol in sorted]
 
-    return solutions, energies, occurrences
+    return solutions, solution_energies, occurrences
 
 
 def method_marker(method):
@@ -67,32 +66,34 @@ def method_marker(method):
         return "_5t"
 
 
-def print_no_solutions(solutions, occurrences, Q_only_hard, offset):
+def print_no_solutions(solutions, occurrences, Problem):
     """ print n.o. all solutions and feasible solutions
 
     - solution is the vector of 1 and 0
     - occurrences is the D-Wave output of particular solution
-    - Q_only_hard - is the matrix with only hard constrains for feasibility check
-    - offset - is a number, the energy of feasible solutions with no soft constrain;
-    it is non zero due to ∑_i x_i = 1 terms
+    - Problem - the dispatching problem, hard constrains are checked directly on
+    timetables of solutions (and auxiliary variables), see constraint_violations,
+    n.o. solutions violating each family of constrains is printed
     """
-    count = 0
-    epsilon = 0.00001
     l = len(solutions)
-    for i in range(l):
-        if energy(solutions[i], Q_only_hard) <= offset + epsilon:
-            count = count + occurrences[i]
+    counts = constraint_violations(solutions, Problem, check_z=True)
+    infeasible = np.any([c > 0 for c in counts.values()], axis=0)
+    count = np.sum(np.asarray(occurrences)[~infeasible])
     print("n.o. solutions all = ", np.sum(occurrences) , "distinct =", l, "feasible = ", count)
+    for family, c in counts.items():
+        if np.any(c):
+            print(f"   {family} violated in", np.sum(np.asarray(occurrences)[c > 0]), "solutions")
 
 
 def analyseQ(Q):
-    """ analyse degree of completness of the graph represented by symmetric Q matrix """
-    s = np.size(Q,0)
-    k = 0
-    for i in range(s):
-        for j in range(i+1, s):
-            if Q[i][j] != 0.:
-                k = k+1
+    """ analyse degree of completness of the graph represented by symmetric Q matrix,
+    Q can be dense or scipy.sparse matrix """
+    if scipy.sparse.issparse(Q):
+        s = Q.shape[0]
+        k = scipy.sparse.triu(Q, k=1).count_nonzero()
+    else:
+        s = np.size(Q,0)
+        k = np.count_nonzero(np.triu(np.array(Q), k=1))
 
     print("n.o. qbits = ", s)
     print("n.o. edges = ", k)
@@ -102,7 +103,7 @@ def analyseQ(Q):
     print("...................")
 
 
-def print_trains_timings(Problem_original, Q_only_hard, f_Q, method, offset):
+def print_trains_timings(Problem_original, f_Q, method):
 
     """
     analyse solutions of particular problem, print train timetable
@@ -111,47 +112,74 @@ def print_trains_timings(Problem_original, Q_only_hard, f_Q, method, offset):
     input:
 
     - Problem_original - object encoding dispatching problem,
-    - Q_only_hard - Qmatrix only with hard constrains for feasibility check,
     - f_Q - file with problem Qmatrix
     - method - describes which problem we are handling to read proper file with D-Wave
     or hybrid solutions
-    - offset) - minimal energy without soft constrains, non-zero from ∑_i x_i = 1 terms
     """
 
     method_f = method_marker(method)
 
 
     print(" DW  results ")
-    Q = np.load(f_Q)["Q"]
+    Q = load_Qmat(f_Q)
     for i in [3, 3.5, 4, 4.5]:
         f = f"files/dwave_data/Qfile_complete_sol_real-anneal_numread3996_antime250_chainst{i}"+method_f
-        solutions, energies, occurrences = load_train_solution(f, i)
+        solutions, file_energies, occurrences = load_train_solution(f, i)
         print("lowest energy")
-        print("   from file = ", energies[0])
+        print("   from file = ", file_energies[0])
         print("   from QUBO = ", energy(solutions[0], Q))
-        print_no_solutions(solutions, occurrences, Q_only_hard, offset)
+        print_no_solutions(solutions, occurrences, Problem_original)
         visualise_Qubo_solution(solutions[0], Problem_original)
 
     print(" Hybrid  solver results  ")
     f = "files/hybrid_data/Qfile_complete_sol_hybrid-anneal"+method_f
 
-    solutions, energies, occurrences = load_train_solution(f, "")
+    solutions, file_energies, occurrences = load_train_solution(f, "")
     print("lowest energy")
-    print("   from file = ", energies[0])
+    print("   from file = ", file_energies[0])
     print("   from QUBO = ", energy(solutions[0], Q))
-    print_no_solutions(solutions, occurrences,Q_only_hard, offset)
+    print_no_solutions(solutions, occurrences, Problem_original)
     visualise_Qubo_solution(solutions[0], Problem_original)
 
 
 
-def save_Qmat(Problem, f):
+def save_Qmat(Problem, f, out_of_core=False, cache=None, integer=False):
     """ compute, analyse and save Qmat
-    given dispatching problem encoded as Problem"""
-    Q = make_Qubo(Problem)
+    given dispatching problem encoded as Problem
+
+    if out_of_core Qmat is streamed to the directory f, see write_Qubo,
+    and it is not held in the memory
+
+    cache - QuboCache, if given Qmat is build only if it is not in the cache
+
+    if integer Qmat is saved with integer entries and the scale, see integer_scaled
+    """
+    if out_of_core:
+        if not os.path.exists(f):
+            print(f"write Q entries to {f}")
+            mapped = write_Qubo(Problem, f)
+            print("n.o. qbits = ", mapped.size)
+            print("n.o. entries = ", mapped.nnz)
+        return
+    Q = make_Qubo(Problem) if cache is None else cache.qubo(Problem)[0]
     analyseQ(Q)
     if not os.path.isfile(f):
         print(f"save Q file to {f}")
-        np.savez(f, Q=Q)
+        Q = Q.toarray() if scipy.sparse.issparse(Q) else Q
+        if integer:
+            Q_int, scale = integer_scaled(Q, dtype=np.int32)
+            np.savez(f, Q=Q_int, scale=scale)
+        else:
+            np.savez(f, Q=Q)
+
+
+
+def load_Qmat(f):
+    """ load Qmat saved by save_Qmat, integer Qmat is divided by its scale """
+    with np.load(f) as data:
+        if "scale" in data:
+            return unscaled(data["Q"], data["scale"])
+        return data["Q"]
 
 
 
@@ -160,45 +188,41 @@ if __name__ == "__main__":
     #####   Q matrix generation #########
 
     from inputs.DW_example import DWave_problem, DWave_problem_enlarged, Problem_of_5_trains
-    Problem_original = DWave_problem(rerouted = False)
-    Problem_rerouted = DWave_problem(rerouted = True)
-    Problem_enlarged= DWave_problem_enlarged()
-    Problem_5trains = Problem_of_5_trains()
+    # inputs are validated and compiled once
+    Problem_original = compile_problem(DWave_problem(rerouted = False))
+    Problem_rerouted = compile_problem(DWave_problem(rerouted = True))
+    Problem_enlarged= compile_problem(DWave_problem_enlarged())
+    Problem_5trains = compile_problem(Problem_of_5_trains())
 
     f1_Q = 'files/Qfile.npz'
     f2_Q = 'files/Qfile_r.npz'
     f3_Q = 'files/Qfile_enlarged.npz'
     f4_Q = 'files/Qfile_5_trains.npz'
 
+    # built Q matrices are reused between runs
+    cache = QuboCache("files/qubo_cache")
+
     print("graph analysis")
     print("original problem ")
-    save_Qmat(Problem_original, f1_Q)
+    save_Qmat(Problem_original, f1_Q, cache=cache)
     print("rerouted problem")
-    save_Qmat(Problem_rerouted, f2_Q)
+    save_Qmat(Problem_rerouted, f2_Q, cache=cache)
     print("enlarged problem")
-    save_Qmat(Problem_enlarged, f3_Q)
+    save_Qmat(Problem_enlarged, f3_Q, cache=cache)
     print("5 trains problem")
-    save_Qmat(Problem_5trains, f4_Q)
+    save_Qmat(Problem_5trains, f4_Q, cache=cache)
 
     print("output analysis")
 
     print("  >>>>>>>>>>>>>>>>>  original problem  <<<<<<<<<<<<<<<<<<<")
-    Problem_original_fesibility = DWave_problem(rerouted = False, soft_constrains = False)
-    Q1 = make_Qubo(Problem_original_fesibility)
-    print_trains_timings(Problem_original, Q1, f1_Q, None, offset = -12.5)
+    print_trains_timings(Problem_original, f1_Q, None)
 
     print("  >>>>>>>>>>>>>>>>>  rerouted problem  <<<<<<<<<<<<<<<<<<<")
-    Problem_rerouted_fesibility = DWave_problem(rerouted = True, soft_constrains = False)
-    Q2 = make_Qubo(Problem_rerouted_fesibility)
-    print_trains_timings(Problem_rerouted, Q2, f2_Q, "rerouted",  offset = -12.5)
+    print_trains_timings(Problem_rerouted, f2_Q, "rerouted")
 
     print("  >>>>>>>>>>>>>>>>>  enlarged problem  <<<<<<<<<<<<<<<<<<<")
-    Problem_enlarged_fesibility = DWave_problem_enlarged(soft_constrains = False)
-    Q3 = make_Qubo(Problem_enlarged_fesibility)
-    print_trains_timings(Problem_enlarged, Q3, f3_Q, "enlarged",  offset = -15.0)
+    print_trains_timings(Problem_enlarged, f3_Q, "enlarged")
 
 
     print("  >>>>>>>>>>>>>>>>>  5 trains problem  <<<<<<<<<<<<<<<<<<<")
-    Problem_5t_fesibility = Problem_of_5_trains(soft_constrains = False)
-    Q4 = make_Qubo(Problem_5t_fesibility)
-    print_trains_timings(Problem_5trains, Q4, f4_Q, "5trains",  offset = -(2*3+1+2)*2.5)
+    print_trains_timings(Problem_5trains, f4_Q, "5trains")
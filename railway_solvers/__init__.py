@@ -2,10 +2,28 @@
 from .helpers_functions import skip_station, not_the_same_rolling_stock, penalty_weights
 from .helpers_functions import subsequent_station, previous_station, occurs_as_pair, earliest_dep_time
 from .helpers_functions import tau, departure_station4switches, previous_train_from_Jround
-from .helpers_functions import energy
+from .helpers_functions import energy, earliest_dep_times, trains_paths_without
+from .helpers_functions import energies, qubo_matrix
 
 from .make_qubo import indexing4qubo, get_coupling, z_indices
 from .make_qubo import get_z_coupling, penalty, P_rolling_stock_circulation
 from .make_qubo import P_track_occupation_condition_quadratic_part, P_Rosenberg_decomposition
 from .make_qubo import P_switch_occupation, P_headway, P_minimal_stay, P_single_track_line
 from .make_qubo import make_Qubo
+
+from .timing import TimingModel
+from .indexing import QuboIndex
+from .vectorized_qubo import make_Qubo_vectorized, conflict_intervals, qubo_index, hobo_terms
+from .vectorized_qubo import upper_triangular, symmetric, qubo_dict
+from .bqm import make_bqm, make_hobo, bqm_from_mapped, bqm_from_sparse
+from .incremental import QuboBuilder
+from .out_of_core import write_Qubo, MappedQubo
+from .terms import qubo_terms, combine_terms, feasibility_offset, TERMS, HARD_TERMS
+from .sweep import penalty_sweep, save_sweep, load_sweep
+from .cache import QuboCache, problem_key
+from .compiled import compile_problem, validate_problem, CompiledProblem
+from .scaling import integer_scaled, unscaled
+from .feasibility import feasible, constraint_violations, decoded_delays, FEASIBILITY_FAMILIES
+from .feasibility import violation_report
+from .local_fields import LocalFields
+from .timetables import decode_timetables, save_timetables, load_timetables, TIMETABLE_COLUMNS
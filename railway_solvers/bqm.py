@@ -0,0 +1,81 @@
+""" dimod binary quadratic and polynomial models written directly from blocks of couplers """
+import numpy as np
+import scipy.sparse
+import dimod
+from .vectorized_qubo import qubo_index, qubo_triplets, hobo_terms, upper_triangular
+
+
+def make_bqm(Problem, prune_z=False):
+    """returns dimod.BinaryQuadraticModel of the particular problem encoded in
+    Problem.trains_paths and Problem.trains_timing
+
+    The model has the same energy as v Q v^T with Q given by make_Qubo, i.e.
+    linear biases are Q[k][k] and quadratic biases are Q[k][l] + Q[l][k].
+    Dense Q matrix is not created.
+
+    Variables are labeled by tuples ("x", j, s, d) -- train j leaves
+    station s at delay d, and ("z", j, j1, s, d, d1) -- auxiliary variables
+    of track occupation condition, see QuboIndex.label
+
+    prune_z -- see make_Qubo_vectorized
+    """
+    index = qubo_index(Problem, prune_z)
+    labels = [index.label(k) for k in range(len(index))]
+    # only the upper triangle is evaluated
+    return _bqm_from_triplets(*qubo_triplets(Problem, index, triangular=True), labels)
+
+
+def bqm_from_sparse(Q, labels=None):
+    """returns dimod.BinaryQuadraticModel of symmetric scipy.sparse Q matrix,
+    variables are labeled by columns or by given labels
+    """
+    U = scipy.sparse.coo_matrix(upper_triangular(Q))
+    labels = range(U.shape[0]) if labels is None else labels
+    return _bqm_from_triplets(U.row, U.col, U.data, labels)
+
+
+def _bqm_from_triplets(rows, cols, vals, labels):
+    """ BQM of the upper triangular matrix given by non-zero entries """
+    linear = np.zeros(len(labels))
+    diagonal = rows == cols
+    linear[rows[diagonal]] = vals[diagonal]
+    quadratic = (rows[~diagonal], cols[~diagonal], vals[~diagonal])
+    return dimod.BinaryQuadraticModel.from_numpy_vectors(linear, quadratic, 0.0, dimod.BINARY,
+                                                         variable_order=list(labels))
+
+
+def make_hobo(Problem):
+    """returns dimod.BinaryPolynomial of the particular problem, where the qubic
+    track occupation condition is not quadratized, so there are no auxiliary
+    variables and no Rosenberg decomposition penalty (p_qubic)
+
+    Variables are labeled by tuples ("x", j, s, d) as in make_bqm.
+    The quadratised model is given by make_bqm.
+    """
+    index = qubo_index(Problem)
+    (rows, cols, vals), (i, i1, i2, vals3) = hobo_terms(Problem, index)
+
+    terms = {}
+    for k, k1, v in zip(rows.tolist(), cols.tolist(), vals.tolist()):
+        if k <= k1:
+            term = frozenset((index.label(k), index.label(k1)))
+            # Q is symmetric, off-diagonal couplers are doubled
+            terms[term] = terms.get(term, 0.0) + (v if k == k1 else 2 * v)
+    for k, k1, k2, v in zip(i.tolist(), i1.tolist(), i2.tolist(), vals3.tolist()):
+        term = frozenset((index.label(k), index.label(k1), index.label(k2)))
+        terms[term] = terms.get(term, 0.0) + v
+    return dimod.BinaryPolynomial(terms, dimod.BINARY)
+
+
+def bqm_from_mapped(mapped, chunk_size=1_000_000):
+    """returns dimod.BinaryQuadraticModel with integer labels of out-of-core
+    Q matrix (MappedQubo), entries are read chunk by chunk
+    """
+    bqm = dimod.BinaryQuadraticModel(dimod.BINARY)
+    bqm.add_linear_from((k, 0.0) for k in range(mapped.size))
+    for rows, cols, vals in mapped.chunks(chunk_size):
+        diagonal = rows == cols
+        bqm.add_linear_from(zip(rows[diagonal].tolist(), vals[diagonal].tolist()))
+        # both Q[k][l] and Q[l][k] are added to the bias of (k, l)
+        bqm.add_quadratic_from(zip(rows[~diagonal].tolist(), cols[~diagonal].tolist(), vals[~diagonal].tolist()))
+    return bqm
@@ -0,0 +1,104 @@
+""" content-addressed on-disk cache of sparse Q matrices """
+import hashlib
+import json
+import os
+import numpy as np
+import scipy.sparse
+from .vectorized_qubo import make_Qubo_vectorized, qubo_index
+
+# bump if the construction of Q changes, so that old entries are not used
+CACHE_VERSION = 1
+
+
+def _canonical(x):
+    """ returns JSON serialisable canonical form of nested dicts, lists and tuples """
+    if isinstance(x, dict):
+        items = [[_canonical(k), _canonical(v)] for k, v in x.items()]
+        return {"dict": sorted(items, key=json.dumps)}
+    if isinstance(x, tuple):
+        return {"tuple": [_canonical(y) for y in x]}
+    if isinstance(x, list):
+        return [_canonical(y) for y in x]
+    if isinstance(x, (np.integer, np.floating)):
+        return _canonical(x.item())
+    if isinstance(x, float):
+        return {"float": repr(x)}
+    return x
+
+
+def problem_key(Problem, prune_z=False):
+    """returns sha256 hex digest of canonical form of Problem.trains_paths,
+    Problem.trains_timing, d_max and penalty weights (p_sum, p_pair, p_qubic)
+    """
+    content = {
+        "version": CACHE_VERSION,
+        "trains_paths": Problem.trains_paths,
+        "trains_timing": Problem.trains_timing,
+        "d_max": Problem.d_max,
+        "weights": [Problem.p_sum, Problem.p_pair, Problem.p_qubic],
+        "prune_z": prune_z,
+    }
+    return hashlib.sha256(json.dumps(_canonical(content)).encode()).hexdigest()
+
+
+class QuboCache():
+    """
+    directory of sparse Q matrices and labels of their variables keyed by
+    problem_key, the total size is limited to max_bytes and least recently
+    used entries are evicted (modification times of files mark the use)
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """ returns (Q, labels) stored at key or None if not in cache """
+        f = self._file(key)
+        if not os.path.isfile(f):
+            return None
+        with np.load(f) as data:
+            Q = scipy.sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=tuple(data["shape"]))
+            labels = [tuple(label) for label in json.loads(str(data["labels"]))]
+        os.utime(f)
+        return Q, labels
+
+    def put(self, key, Q, labels):
+        """ stores sparse Q and labels of its variables at key, evicts least
+        recently used entries if the size of the cache exceeds max_bytes
+        """
+        Q = scipy.sparse.csr_matrix(Q)
+        f = self._file(key)
+        tmp = f"{f}.tmp.npz"
+        np.savez(tmp, data=Q.data, indices=Q.indices, indptr=Q.indptr, shape=np.array(Q.shape),
+                 labels=np.array(json.dumps(labels)))
+        os.replace(tmp, f)
+        self.evict()
+
+    def evict(self):
+        """ removes least recently used entries until the size is within max_bytes """
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".npz")]
+        files.sort(key=os.path.getmtime)
+        size = sum(os.path.getsize(f) for f in files)
+        while files and size > self.max_bytes:
+            f = files.pop(0)
+            size -= os.path.getsize(f)
+            os.remove(f)
+
+    def qubo(self, Problem, prune_z=False):
+        """returns (Q, labels), sparse Q matrix of make_Qubo_vectorized and labels
+        of its variables (QuboIndex.label), built only if not in the cache
+        """
+        key = problem_key(Problem, prune_z)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        Q = make_Qubo_vectorized(Problem, format="sparse", prune_z=prune_z)
+        index = qubo_index(Problem, prune_z)
+        labels = [index.label(k) for k in range(len(index))]
+        self.put(key, Q, labels)
+        return Q, labels
@@ -0,0 +1,207 @@
+""" compiled and validated dispatching problem, reused by builders and decoders """
+import copy
+import numbers
+import numpy as np
+from .helpers_functions import earliest_dep_times
+from .timing import TimingModel
+from .indexing import QuboIndex, x_blocks, z_blocks
+from .vectorized_qubo import interacting_blocks, interacting_z_blocks, PAIRWISE_CONDITIONS
+from .vectorized_qubo import track_occupation_block
+
+
+def _read_only(*args, **kwargs):
+    raise TypeError("inputs of CompiledProblem are immutable")
+
+
+class _FrozenDict(dict):
+    """ read-only dict of inputs of CompiledProblem, copies are plain dicts """
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return {copy.deepcopy(k, memo): copy.deepcopy(v, memo) for k, v in self.items()}
+
+    def __reduce__(self):
+        return _FrozenDict, (dict(self),)
+
+
+class _FrozenList(list):
+    """ read-only list of inputs of CompiledProblem, copies are plain lists """
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return [copy.deepcopy(x, memo) for x in self]
+
+    def __reduce__(self):
+        return _FrozenList, (list(self),)
+
+
+def _frozen(x):
+    """ returns read-only copy of nested dicts, lists and tuples """
+    if isinstance(x, dict):
+        return _FrozenDict({k: _frozen(v) for k, v in x.items()})
+    if isinstance(x, list):
+        return _FrozenList(_frozen(y) for y in x)
+    if isinstance(x, tuple):
+        return tuple(_frozen(y) for y in x)
+    return x
+
+
+class CompiledProblem():
+    """
+    immutable compiled dispatching problem, it can be passed everywhere the
+    Problem is expected (make_Qubo_vectorized, make_bqm, qubo_terms, etc.)
+
+    - trains_paths, trains_timing, d_max, p_sum, p_pair, p_qubic -- read-only
+      copies of these of the Problem (copy.deepcopy gives plain dicts and lists)
+    - timing -- TimingModel, interned ids, time spans and earliest departures
+    - index -- QuboIndex of variables
+    - pairs, z_pairs -- interacting_blocks and interacting_z_blocks
+    - dep_times -- {(j, s): earliest departure time}, see earliest_dep_times
+
+    see compile_problem
+    """
+
+    def __init__(self, Problem, timing, index, pairs, z_pairs):
+        self.trains_paths = _frozen(copy.deepcopy(Problem.trains_paths))
+        self.trains_timing = _frozen(copy.deepcopy(Problem.trains_timing))
+        self.d_max = Problem.d_max
+        self.p_sum = Problem.p_sum
+        self.p_pair = Problem.p_pair
+        self.p_qubic = Problem.p_qubic
+        self.timing = timing
+        self.index = index
+        self.pairs = tuple(pairs)
+        self.z_pairs = tuple(z_pairs)
+        self.dep_times = {(timing.trains[j], timing.stations[s]): timing.dep_time[j, s]
+                          for j, s in zip(*np.nonzero(~np.isnan(timing.dep_time)))}
+        for x in [timing.pass_time, timing.next_station, timing.stop_time, timing.prep_time,
+                  timing.dep_time, timing.weight]:
+            x.flags.writeable = False
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"CompiledProblem is immutable, can not set {name}")
+        object.__setattr__(self, name, value)
+
+
+def validate_problem(Problem):
+    """returns vector of descriptions of errors in the input of the Problem,
+    empty if the Problem is valid
+
+    checks parameters, paths of all trains in sets of trains, earliest departure
+    times and all time spans used by constrains (evaluated on the single
+    delay, so it is cheap)
+    """
+    return _checked(Problem)[0]
+
+
+def _checked(Problem):
+    """ returns errors of the Problem and if there are none, compiled parts:
+    TimingModel, interacting_blocks and interacting_z_blocks
+    """
+    errors = []
+    for name in ["trains_paths", "trains_timing", "d_max", "p_sum", "p_pair", "p_qubic"]:
+        if not hasattr(Problem, name):
+            errors.append(f"missing {name}")
+    if errors:
+        return errors, None
+    if not isinstance(Problem.d_max, numbers.Integral) or Problem.d_max < 0:
+        errors.append(f"d_max should be non-negative integer, not {Problem.d_max}")
+    for name in ["p_sum", "p_pair", "p_qubic"]:
+        if not isinstance(getattr(Problem, name), numbers.Real):
+            errors.append(f"{name} should be a number, not {getattr(Problem, name)}")
+
+    trains_paths = Problem.trains_paths
+    trains_timing = Problem.trains_timing
+    for key in ["J", "Paths", "Jtrack"]:
+        if key not in trains_paths:
+            errors.append(f"missing trains_paths[{key!r}]")
+    if any(trains_paths.get("Jtrack", {}).values()) and "Jround" not in trains_paths:
+        errors.append("missing trains_paths['Jround'], required by the track occupation condition of Jtrack")
+    for key in ["initial_conditions", "tau"]:
+        if key not in trains_timing:
+            errors.append(f"missing trains_timing[{key!r}]")
+    if errors:
+        return errors, None
+
+    S = trains_paths["Paths"]
+    for j in trains_paths["J"]:
+        if j not in S:
+            errors.append(f"no path of train {j}")
+        elif len(S[j]) == 0:
+            errors.append(f"empty path of train {j}")
+    for key, j in _trains_in_sets(trains_paths):
+        if j not in S:
+            errors.append(f"train {j} in {key} has no path")
+    train_stations = {f"{j}_{s}" for j in trains_paths["J"] if j in S for s in S[j]}
+    for key in trains_timing.get("penalty_weights", {}):
+        if key not in train_stations:
+            errors.append(f"penalty weight {key} is not given for the train and the station on its path")
+    if errors:
+        return errors, None
+
+    for j in trains_paths["J"]:
+        try:
+            earliest_dep_times(dict(trains_paths, J=[j]), trains_timing)
+        except ValueError as e:
+            errors.append(str(e))
+    if errors:
+        return errors, None
+
+    # time spans used by constrains, evaluated on blocks of the single delay
+    timing = TimingModel(trains_paths, trains_timing)
+    pairs, z_pairs = interacting_blocks(trains_paths), interacting_z_blocks(trains_paths)
+    blocks, blocks_z = x_blocks(trains_paths), z_blocks(trains_paths)
+    for b, b1 in pairs:
+        (j, s), (j1, s1) = blocks[b], blocks[b1]
+        for condition, intervals in PAIRWISE_CONDITIONS.items():
+            try:
+                intervals(j, s, j1, s1, timing, trains_paths)
+            except KeyError as e:
+                errors.append(f"missing {e.args[0]} for {condition} condition of {j} at {s} and {j1} at {s1}")
+    for b, bz in z_pairs:
+        (jx, sx), (sz, jz, jz1) = blocks[b], blocks_z[bz]
+        try:
+            track_occupation_block(jx, sx, sz, jz, jz1, timing, trains_paths, 0)
+        except KeyError as e:
+            errors.append(f"missing {e.args[0]} for track occupation of {jx} at {sx}, {jz} and {jz1} at {sz}")
+    if errors:
+        return list(dict.fromkeys(errors)), None
+    return [], (timing, pairs, z_pairs)
+
+
+def _trains_in_sets(trains_paths):
+    """ yields (name of the set, train) for trains in Jd, Josingle, Jround, Jtrack, Jswitch """
+    for s, Jd_s in trains_paths.get("Jd", {}).items():
+        for s1, groups in Jd_s.items():
+            for js in groups:
+                yield from ((f"Jd[{s!r}][{s1!r}]", j) for j in js)
+    for key in ["Josingle", "Jround", "Jtrack"]:
+        for s, groups in trains_paths.get(key, {}).items():
+            for js in groups:
+                yield from ((f"{key}[{s!r}]", j) for j in js)
+    for s, switches in trains_paths.get("Jswitch", {}).items():
+        for switch in switches:
+            yield from ((f"Jswitch[{s!r}]", j) for j in switch)
+
+
+def compile_problem(Problem):
+    """validates the Problem (see validate_problem) and returns CompiledProblem
+
+    Raises ValueError listing all errors of the input
+    """
+    errors, parts = _checked(Problem)
+    if errors:
+        raise ValueError("invalid Problem:\n" + "\n".join(errors))
+    timing, pairs, z_pairs = parts
+    index = QuboIndex(Problem.trains_paths, Problem.d_max)
+    return CompiledProblem(Problem, timing, index, pairs, z_pairs)
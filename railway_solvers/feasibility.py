@@ -0,0 +1,186 @@
+""" hard constrains checked directly on timetables decoded from samples, no Q matrix is built """
+import numpy as np
+from .vectorized_qubo import qubo_index, problem_pairs, problem_timing
+from .vectorized_qubo import track_occupation_block, PAIRWISE_BLOCKS
+
+# families of hard constrains checked by constraint_violations, names as in TERMS
+FEASIBILITY_FAMILIES = ["sum"] + list(PAIRWISE_BLOCKS) + ["track_occupation", "rosenberg"]
+
+
+def binary_samples(samples):
+    """ returns 2-D float array of 0/1 samples, ±1 samples are converted """
+    V = np.atleast_2d(np.asarray(samples, dtype=float))
+    if np.any(V == -1):
+        V = (V + 1) / 2
+    return V
+
+
+def x_samples(samples, index):
+    """returns (samples, x blocks, d_max + 1) array of x variables of samples,
+    columns of samples are given by index (QuboIndex), z variables are ignored
+    """
+    V = binary_samples(samples)
+    return V[:, :index.q_bits].reshape(len(V), len(index.blocks), index.d_max + 1)
+
+
+def decoded_delays(samples, index):
+    """returns (samples, x blocks) int array of delays of trains at stations,
+    blocks are index.blocks, -1 if ∑_i x_i = 1 condition is not satisfied
+    """
+    X = x_samples(samples, index)
+    delays = np.argmax(X, axis=2)
+    delays[np.sum(X, axis=2) != 1] = -1
+    return delays
+
+
+def _pair_masks(Problem, index, timing):
+    """ yields (family, b, b1, mask) of conflicting delays of pairs of x blocks
+    b <= b1, conditions of (b, b1) and (b1, b) are merged
+    """
+    trains_paths = Problem.trains_paths
+    d_max = Problem.d_max
+    pairs, _ = problem_pairs(Problem)
+    for b, b1 in pairs:
+        if b > b1:
+            continue
+        (j, s), (j1, s1) = index.blocks[b], index.blocks[b1]
+        for family, block in PAIRWISE_BLOCKS.items():
+            mask = None
+            J = block(j, s, j1, s1, timing, trains_paths, d_max)
+            if J is not None:
+                mask = J != 0
+            if b != b1:
+                J = block(j1, s1, j, s, timing, trains_paths, d_max)
+                if J is not None:
+                    mask = J.T != 0 if mask is None else mask | (J.T != 0)
+            if mask is not None and np.any(mask):
+                yield family, b, b1, mask
+
+
+def _track_masks(Problem, index, timing):
+    """ yields (b, bz, mask) of conflicting delays of x block b and pairs of
+    delays of z block bz of track occupation condition
+    """
+    trains_paths = Problem.trains_paths
+    _, z_pairs = problem_pairs(Problem)
+    for b, bz in z_pairs:
+        (jx, sx), (sz, jz, jz1) = index.blocks[b], index.blocks_z[bz]
+        J = track_occupation_block(jx, sx, sz, jz, jz1, timing, trains_paths, Problem.d_max)
+        if J is not None and np.any(J):
+            yield b, bz, J != 0
+
+
+def _z_products(X, index, position, bz):
+    """ returns (samples, (d_max + 1)^2) products x(jz, sz, d) x(jz1, sz, d1)
+    replacing z variables of the block bz, None if x blocks are missing
+    """
+    sz, jz, jz1 = index.blocks_z[bz]
+    if (jz, sz) not in position or (jz1, sz) not in position:
+        return None
+    x, x1 = X[:, position[(jz, sz)]], X[:, position[(jz1, sz)]]
+    return (x[:, :, None] * x1[:, None, :]).reshape(len(X), -1)
+
+
+def constraint_violations(samples, Problem, index=None, check_z=False):
+    """returns dict {family: vector of numbers of violations per sample} of
+    hard constrains evaluated on timetables decoded from samples, families
+    are FEASIBILITY_FAMILIES
+
+    - sum -- x blocks that do not satisfy ∑_i x_i = 1
+    - headway, minimal_stay, single_track, rolling_stock, switch -- pairs of
+      conflicting delays
+    - track_occupation -- conflicting triples of delays, evaluated on x variables
+    - rosenberg -- if check_z, auxiliary variables z ≠ x x1, otherwise zeros
+
+    columns of samples (0/1 or ±1) are given by index, qubo_index(Problem) by default
+    """
+    index = qubo_index(Problem) if index is None else index
+    timing = problem_timing(Problem)
+    V = binary_samples(samples)
+    X = x_samples(V, index)
+    position = {block: b for b, block in enumerate(index.blocks)}
+
+    counts = {family: np.zeros(len(V), dtype=np.int64) for family in FEASIBILITY_FAMILIES}
+    counts["sum"] += np.sum(np.sum(X, axis=2) != 1, axis=1)
+    for family, b, b1, mask in _pair_masks(Problem, index, timing):
+        counts[family] += np.rint(np.einsum("ij,jk,ik->i", X[:, b], mask, X[:, b1])).astype(np.int64)
+    for b, bz, mask in _track_masks(Problem, index, timing):
+        Z = _z_products(X, index, position, bz)
+        if Z is not None:
+            counts["track_occupation"] += np.rint(np.einsum("ij,jk,ik->i", X[:, b], mask, Z)).astype(np.int64)
+    if check_z:
+        for bz, offset in enumerate(index.z_offsets):
+            active = index.z_active[bz]
+            Z = _z_products(X, index, position, bz)
+            z = V[:, offset:offset + np.count_nonzero(active)]
+            expected = np.zeros_like(z) if Z is None else Z[:, active]
+            counts["rosenberg"] += np.sum(z != expected, axis=1)
+    return counts
+
+
+def feasible(samples, Problem, index=None, check_z=False):
+    """returns boolean vector, True for samples that satisfy all hard constrains,
+    see constraint_violations; no Q matrix and no energy offset are needed
+
+    with check_z the result is as of the energy check of Q with only hard
+    constrains against feasibility_offset; this check is shared by
+    print_no_solutions and penalty_sweep
+    """
+    counts = constraint_violations(samples, Problem, index, check_z)
+    return np.all([c == 0 for c in counts.values()], axis=0)
+
+
+def violation_report(samples, Problem, index=None, check_z=False):
+    """returns (counts, violations) of hard constrains of samples
+
+    - counts -- dict {family: vector of numbers of violations per sample},
+      see constraint_violations
+    - violations -- vector of (sample, family, variables) sorted by samples,
+      variables are offending (train, station, delay): all x = 1 of the block
+      for sum, the pair for pairwise conditions and the triple for track
+      occupation (the train of x and two trains of z), the pair of z for rosenberg
+
+    masks of conditions are computed once for all samples, the compiled
+    Problem (see compile_problem) is reused
+    """
+    index = qubo_index(Problem) if index is None else index
+    timing = problem_timing(Problem)
+    V = binary_samples(samples)
+    X = x_samples(V, index)
+    position = {block: b for b, block in enumerate(index.blocks)}
+    n = index.d_max + 1
+
+    violations = []
+    for b, (j, s) in enumerate(index.blocks):
+        for k in np.nonzero(np.sum(X[:, b], axis=1) != 1)[0]:
+            variables = tuple((j, s, int(d)) for d in np.nonzero(X[k, b])[0])
+            violations.append((int(k), "sum", variables))
+    for family, b, b1, mask in _pair_masks(Problem, index, timing):
+        (j, s), (j1, s1) = index.blocks[b], index.blocks[b1]
+        hits = X[:, b, :, None] * mask[None] * X[:, b1, None, :]
+        for k, d, d1 in zip(*np.nonzero(hits)):
+            violations.append((int(k), family, ((j, s, int(d)), (j1, s1, int(d1)))))
+    for b, bz, mask in _track_masks(Problem, index, timing):
+        Z = _z_products(X, index, position, bz)
+        if Z is None:
+            continue
+        (jx, sx), (sz, jz, jz1) = index.blocks[b], index.blocks_z[bz]
+        hits = X[:, b, :, None] * mask[None] * Z[:, None, :]
+        for k, d, dz in zip(*np.nonzero(hits)):
+            variables = ((jx, sx, int(d)), (jz, sz, int(dz // n)), (jz1, sz, int(dz % n)))
+            violations.append((int(k), "track_occupation", variables))
+    if check_z:
+        for bz, offset in enumerate(index.z_offsets):
+            active = index.z_active[bz]
+            sz, jz, jz1 = index.blocks_z[bz]
+            Z = _z_products(X, index, position, bz)
+            z = V[:, offset:offset + np.count_nonzero(active)]
+            expected = np.zeros_like(z) if Z is None else Z[:, active]
+            dz = np.nonzero(active)[0]
+            for k, c in zip(*np.nonzero(z != expected)):
+                variables = ((jz, sz, int(dz[c] // n)), (jz1, sz, int(dz[c] % n)))
+                violations.append((int(k), "rosenberg", variables))
+    violations.sort(key=lambda v: v[0])
+    counts = {family: np.bincount([k for k, f, _ in violations if f == family], minlength=len(V))
+              for family in FEASIBILITY_FAMILIES}
+    return counts, violations
@@ -1,6 +1,7 @@
 
 """heplers for QUBO creation """
 import numpy as np
+import scipy.sparse
 
 def occurs_as_pair(a, b, vecofvec):
     """checks whether a and b occurs together in the same vector of vectors """
@@ -100,9 +101,80 @@ def earliest_dep_time(S, trains_timing, train, station):
     return np.maximum(sched, unavoidable)
 
 
+def earliest_dep_times(trains_paths, trains_timing):
+    """returns dict {(train, station): earliest departure time} for all trains
+    and stations, as earliest_dep_time, computed once going forward along paths
+
+    Raises ValueError if the path is cyclic or if the earliest departure of
+    a train from a station that is not skipped can not be computed due to
+    missing initial conditions, passing or stopping times
+    """
+    S = trains_paths["Paths"]
+    dep_times = {}
+    for j in trains_paths["J"]:
+        if len(set(S[j])) != len(S[j]):
+            raise ValueError(f"path of train {j} is cyclic, {S[j]}")
+        missing = None
+        for k, s in enumerate(S[j]):
+            train_station = f"{j}_{s}"
+            try:
+                if "schedule" in trains_timing:
+                    sched = trains_timing["schedule"][train_station]
+                else:
+                    sched = -np.inf
+                if train_station in trains_timing["initial_conditions"]:
+                    unaviodable = trains_timing["initial_conditions"][train_station]
+                    dep_times[(j, s)] = np.maximum(sched, unaviodable)
+                    missing = None
+                elif missing is None and k > 0:
+                    s_prev = S[j][k - 1]
+                    tau_pass = tau(trains_timing, "pass", first_train=j, first_station=s_prev, second_station=s)
+                    tau_stop = tau(trains_timing, "stop", first_train=j, first_station=s)
+                    unavoidable = dep_times[(j, s_prev)] + tau_pass
+                    unavoidable += tau_stop
+                    dep_times[(j, s)] = np.maximum(sched, unavoidable)
+                elif missing is None:
+                    missing = f"no initial conditions for {train_station}"
+            except KeyError as e:
+                missing = f"missing {e} for {train_station}"
+            if missing is not None and not skip_station(j, s, trains_paths):
+                raise ValueError(f"can not compute earliest departure of train {j} from {s}, {missing}")
+    return dep_times
+
+
 # helpers for trains set
 
 
+def trains_paths_without(trains_paths, j):
+    """returns copy of trains_paths with train j removed from J, Paths and
+    all sets of trains; groups (Jd, Josingle, Jtrack) and switches (Jswitch)
+    lose j and are removed if a single train is left, pairs of Jround with j
+    are removed
+    """
+    def without(groups):
+        groups = [[j1 for j1 in js if j1 != j] for js in groups]
+        return [js for js in groups if len(js) > 1]
+
+    new = dict(trains_paths)
+    new["J"] = [j1 for j1 in trains_paths["J"] if j1 != j]
+    new["Paths"] = {j1: path for j1, path in trains_paths["Paths"].items() if j1 != j}
+    if "Jd" in trains_paths:
+        new["Jd"] = {s: {s1: without(groups) for s1, groups in Jd_s.items()} for s, Jd_s in trains_paths["Jd"].items()}
+    for key in ["Josingle", "Jtrack"]:
+        if key in trains_paths:
+            new[key] = {s: without(groups) for s, groups in trains_paths[key].items()}
+    if "Jround" in trains_paths:
+        new["Jround"] = {s: [pair for pair in pairs if j not in pair] for s, pairs in trains_paths["Jround"].items()}
+    if "Jswitch" in trains_paths:
+        new["Jswitch"] = {}
+        for s, switches in trains_paths["Jswitch"].items():
+            switches = [{j1: v for j1, v in switch.items() if j1 != j} for switch in switches]
+            new["Jswitch"][s] = [switch for switch in switches if len(switch) > 1]
+    if "skip_station" in trains_paths:
+        new["skip_station"] = {j1: s for j1, s in trains_paths["skip_station"].items() if j1 != j}
+    return new
+
+
 def not_the_same_rolling_stock(j, jp, trains_paths):
     """checks if two trains (j, jp) are not served by the same rolling stock"""
     if "Jround" not in trains_paths:
@@ -113,6 +185,18 @@ def not_the_same_rolling_stock(j, jp, trains_paths):
     return True
 
 
+def rolling_stock_partners(trains_paths):
+    """returns dict {j: set of trains served by the same rolling stock as j},
+    not_the_same_rolling_stock(j, jp) is jp not in the set of j
+    """
+    partners = {}
+    for pairs in trains_paths.get("Jround", {}).values():
+        for js in pairs:
+            for j in js:
+                partners.setdefault(j, set()).update(jp for jp in js if jp != j)
+    return partners
+
+
 def departure_station4switches(s, j, place_of_switch, trains_paths):
     """returns the station symbol from which train j departes prior to passing
     the swith at station s
@@ -156,9 +240,41 @@ def previous_train_from_Jround(trains_paths,j, s):
 
 
 def energy(v, Q):
-    """compute energy from QUBO """
+    """compute energy from QUBO, Q can be dense or scipy.sparse matrix or
+    out-of-core MappedQubo (evaluated in chunks)
+    """
     if -1 in v:
         v = [(y + 1) / 2 for y in v]
-    X = np.array(Q)
+    if hasattr(Q, "chunks"):
+        return Q.energy(v)
+    X = Q if scipy.sparse.issparse(Q) else np.array(Q)
     V = np.array(v)
     return V @ X @ V.transpose()
+
+
+def qubo_matrix(Q):
+    """returns Q converted for energies: numpy array or scipy.sparse csr_matrix,
+    out-of-core MappedQubo is returned as it is
+
+    convert Q once to reuse it in many calls of energies
+    """
+    if hasattr(Q, "chunks"):
+        return Q
+    if scipy.sparse.issparse(Q):
+        return Q if scipy.sparse.isspmatrix_csr(Q) else scipy.sparse.csr_matrix(Q)
+    return np.asarray(Q)
+
+
+def energies(samples, Q):
+    """returns vector of energies of samples, rows of 2-D matrix of 0/1 or ±1,
+    computed in one batched product
+
+    Q as in energy, see also qubo_matrix
+    """
+    V = np.atleast_2d(np.asarray(samples, dtype=float))
+    if np.any(V == -1):
+        V = (V + 1) / 2
+    X = qubo_matrix(Q)
+    if hasattr(X, "chunks"):
+        return X.energies(V)
+    return np.einsum("ij,ij->i", V, np.asarray(X @ V.T).T)
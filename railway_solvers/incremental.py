@@ -0,0 +1,214 @@
+""" persistent QUBO builder, updated block by block between dispatch cycles """
+import copy
+import types
+import numpy as np
+import scipy.sparse
+from .helpers_functions import trains_paths_without
+from .timing import TimingModel
+from .indexing import QuboIndex
+from .vectorized_qubo import interacting_blocks, interacting_z_blocks
+from .vectorized_qubo import xx_block, xz_block, z_diagonal, _triplets
+
+
+class QuboBuilder():
+    """
+    keeps the compiled structure of the Problem (sets of trains, paths, Jd,
+    Jtrack, etc. and pairs of interacting blocks of variables) together with
+    the blocks of Q matrix
+
+    blocks are keyed by labels ("x", (j, s), (j1, s1)) and ("z", (j, s), (s, j, j1))
+    so they survive changes of the set of trains
+
+    update -- changes initial conditions, the schedule or penalty weights,
+    only blocks of trains that are affected are recomputed
+
+    add_train, remove_train -- changes the set of trains, only blocks of the
+    train and of trains sharing rolling stock with it are recomputed
+
+    qubo -- returns Q matrix identical with make_Qubo of the updated Problem,
+    columns are labeled by index.label
+    """
+
+    def __init__(self, Problem):
+        # own copy of inputs, Problem may be compiled (immutable), see compile_problem
+        self.Problem = types.SimpleNamespace(
+            trains_paths=copy.deepcopy(Problem.trains_paths),
+            trains_timing=copy.deepcopy(Problem.trains_timing),
+            d_max=Problem.d_max, p_sum=Problem.p_sum, p_pair=Problem.p_pair, p_qubic=Problem.p_qubic,
+        )
+        self._blocks = {}
+        self._restructure(self.Problem.trains_paths, set(self.Problem.trains_paths["J"]))
+
+    def _restructure(self, trains_paths, trains):
+        """ compiles trains_paths, blocks of given trains are recomputed
+        the other are reused if they are still present
+        """
+        S = trains_paths["Paths"]
+        self.Problem.trains_paths = trains_paths
+        self.index = QuboIndex(trains_paths, self.Problem.d_max)
+        self.timing = TimingModel(trains_paths, self.Problem.trains_timing)
+        self._train_station = {f"{j}_{s}": (j, s) for j in trains_paths["J"] for s in S[j]}
+        self._x_id = {block: b for b, block in enumerate(self.index.blocks)}
+        self._z_id = {block: bz for bz, block in enumerate(self.index.blocks_z)}
+
+        keys = [("x", self.index.blocks[b], self.index.blocks[b1]) for b, b1 in interacting_blocks(trains_paths)]
+        keys += [("z", self.index.blocks[b], self.index.blocks_z[bz]) for b, bz in interacting_z_blocks(trains_paths)]
+
+        blocks = {}
+        self._by_train = {j: [] for j in trains_paths["J"]}
+        for key in keys:
+            if key in self._blocks and not trains & _trains_of(key):
+                blocks[key] = self._blocks[key]
+            else:
+                blocks[key] = self._compute(key)
+            for j in _trains_of(key) & set(self._by_train):
+                self._by_train[j].append(key)
+        self._blocks = blocks
+
+    def _compute(self, key):
+        kind, block, block1 = key
+        if kind == "x":
+            return xx_block(self._x_id[block], self._x_id[block1], self.Problem, self.index, self.timing)
+        return xz_block(self._x_id[block], self._z_id[block1], self.Problem, self.index, self.timing)
+
+    def _placed(self, key, J, full=False):
+        """ returns list of (rows, columns, values) of the block J of Q matrix,
+        if full all entries of the block are given, otherwise non-zero ones
+        """
+        kind, block, block1 = key
+        x0 = self.index.x_offsets
+        place = _full_triplets if full else _triplets
+        if kind == "x":
+            return [place(x0[self._x_id[block]], x0[self._x_id[block1]], J)]
+        b, bz = self._x_id[block], self._z_id[block1]
+        z0 = self.index.z_offsets
+        return [place(x0[b], z0[bz], J), place(z0[bz], x0[b], J.T)]
+
+    def update(self, initial_conditions=None, schedule=None, penalty_weights=None):
+        """updates trains_timing by given dicts {"j_s": value} and recomputes
+        blocks of trains with changed departure times and diagonal blocks of
+        changed penalty weights
+
+        returns (rows, columns, values) of all entries of recomputed blocks
+        (including zeros), setting Q[rows, cols] = values brings a dense Q up
+        to date
+
+        Raises KeyError if the key is not the train and the station on its path
+        """
+        trains_timing = self.Problem.trains_timing
+        trains = set()
+        for field, diff in [("initial_conditions", initial_conditions), ("schedule", schedule)]:
+            for key, value in (diff or {}).items():
+                trains.add(self._train_station[key][0])
+                trains_timing.setdefault(field, {})[key] = value
+        weights = set()
+        for key, value in (penalty_weights or {}).items():
+            weights.add(self._train_station[key])
+            trains_timing.setdefault("penalty_weights", {})[key] = value
+
+        self.timing.update_trains(self.Problem.trains_paths, trains_timing,
+                                  trains | {j for j, _ in weights})
+
+        keys = {key for j in trains for key in self._by_train[j]}
+        keys |= {("x", block, block) for block in weights if block in self._x_id}
+
+        n = self.Problem.d_max + 1
+        changed = []
+        for key in keys:
+            self._blocks[key] = self._compute(key)
+            J = self._blocks[key]
+            if J is None:
+                J = np.zeros((n, n if key[0] == "x" else np.count_nonzero(self.index.z_active[self._z_id[key[2]]])))
+            changed += self._placed(key, J, full=True)
+        if not changed:
+            return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+        return tuple(np.concatenate(x) for x in zip(*changed))
+
+    def remove_train(self, j):
+        """removes train j (e.g. cancelled) from trains_paths and all its sets,
+        see trains_paths_without, labels of other variables are not changed
+        """
+        trains_paths = self.Problem.trains_paths
+        if j not in trains_paths["J"]:
+            raise KeyError(f"train {j} is not in the problem")
+        trains = {j} | _rolling_stock_partners(trains_paths, j)
+        self._restructure(trains_paths_without(trains_paths, j), trains)
+
+    def add_train(self, j, trains_paths, trains_timing):
+        """adds train j (e.g. extra service), trains_paths are complete sets of
+        the problem including j, trains_timing are complete timing data,
+        labels of other variables are not changed
+
+        blocks of other trains with changed timing data are recomputed as well,
+        all blocks if times (tau) or other common data are changed
+        """
+        if j in self.Problem.trains_paths["J"]:
+            raise KeyError(f"train {j} is already in the problem")
+        if j not in trains_paths["J"]:
+            raise KeyError(f"train {j} is not in given trains_paths")
+        trains = {j} | _rolling_stock_partners(trains_paths, j)
+        trains |= _changed_trains(self.Problem.trains_timing, trains_timing, trains_paths)
+        self.Problem.trains_timing = copy.deepcopy(trains_timing)
+        self._restructure(copy.deepcopy(trains_paths), trains)
+
+    def couplers(self):
+        """ yields (rows, columns, values) of non-zero entries block by block """
+        for key, J in self._blocks.items():
+            if J is not None:
+                yield from self._placed(key, J)
+        for bz in range(len(self.index.blocks_z)):
+            yield z_diagonal(bz, self.Problem, self.index)
+
+    def qubo(self, format="dense"):  # pylint: disable=redefined-builtin
+        """ returns Q matrix of the current Problem, see make_Qubo_vectorized """
+        size = len(self.index)
+        if format == "dense":
+            Q = np.zeros((size, size))
+            for rows, cols, vals in self.couplers():
+                Q[rows, cols] = vals
+            return Q
+        if format == "sparse":
+            rows, cols, vals = (np.concatenate(x) for x in zip(*self.couplers()))
+            return scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(size, size))
+        raise ValueError(f"unknown format {format}, use 'dense' or 'sparse'")
+
+
+def _trains_of(key):
+    """ returns set of trains of the pair of blocks """
+    kind, (j, _), block1 = key
+    if kind == "x":
+        return {j, block1[0]}
+    return {j, block1[1], block1[2]}
+
+
+def _rolling_stock_partners(trains_paths, j):
+    """ returns set of trains that share rolling stock with j (Jround) """
+    return {j1 for pairs in trains_paths.get("Jround", {}).values() for pair in pairs if j in pair for j1 in pair}
+
+
+def _changed_trains(trains_timing, trains_timing1, trains_paths):
+    """ returns set of trains of trains_paths with different entries
+    {"j_s": value} of trains_timing and trains_timing1, all trains if other
+    data (e.g. tau) differ
+    """
+    S = trains_paths["Paths"]
+    train_of = {f"{j}_{s}": j for j in trains_paths["J"] for s in S[j]}
+    trains = set()
+    for field in set(trains_timing) | set(trains_timing1):
+        old, new = trains_timing.get(field, {}), trains_timing1.get(field, {})
+        if field not in ["initial_conditions", "schedule", "penalty_weights"]:
+            if old != new:
+                return set(trains_paths["J"])
+            continue
+        for key in set(old) | set(new):
+            if key in train_of and old.get(key) != new.get(key):
+                trains.add(train_of[key])
+    return trains
+
+
+def _full_triplets(row0, col0, J):
+    """ returns rows, columns and values of all entries of the block J
+    placed at (row0, col0) of Qmat
+    """
+    r, c = np.indices(J.shape)
+    return row0 + r.ravel(), col0 + c.ravel(), J.ravel()
@@ -0,0 +1,142 @@
+""" compact indexing of QUBO variables backed by numpy integer arrays """
+import itertools
+import numpy as np
+from .helpers_functions import skip_station, rolling_stock_partners
+from .timing import intern_ids
+
+X_VAR = 0
+Z_VAR = 1
+
+
+def x_blocks(trains_paths):
+    """returns vector of (j, s) blocks of x variables ordered as in indexing4qubo,
+    each block contains d_max + 1 consecutive variables
+    """
+    S = trains_paths["Paths"]
+    return [(j, s) for j in trains_paths["J"] for s in S[j] if not skip_station(j, s, trains_paths)]
+
+
+def z_blocks(trains_paths):
+    """returns vector of (s, j, j1) blocks of auxiliary variables ordered as in
+    z_indices, each block contains (d_max + 1)^2 consecutive variables
+    """
+    partners = rolling_stock_partners(trains_paths)
+    blocks = []
+    for s in trains_paths["Jtrack"].keys():
+        for js in trains_paths["Jtrack"][s]:
+            for (j, j1) in itertools.combinations(js, 2):
+                if j1 not in partners.get(j, ()):
+                    blocks.append((s, j, j1))
+    return blocks
+
+
+class QuboIndex():
+    """
+    indices of QUBO variables, the column k of Q matrix corresponds to
+
+    - kind[k] -- X_VAR for x variables (train leaves station at delay),
+      Z_VAR for auxiliary variables of track occupation condition
+    - train[k], station[k], delay[k] -- ids of j, s and d
+    - train1[k], delay1[k] -- ids of j1 and d1 of auxiliary variables (-1 for x)
+
+    ids are positions in vectors trains and stations. Variables are ordered as
+    in indexing4qubo followed by z_indices. Blocks of variables start at
+    x_offsets (blocks x_blocks) and z_offsets (blocks z_blocks).
+
+    z_active -- optional vector of boolean masks, one per z block, of the
+    length (d_max + 1)^2, auxiliary variables that are not active are pruned
+    track_blocks -- optional track occupation blocks {(b, bz): block} of which
+    z_active are computed, reused by the build, see qubo_index
+    """
+
+    def __init__(self, trains_paths, d_max, z_active=None, track_blocks=None):
+        self.d_max = d_max
+        self.track_blocks = track_blocks
+        n = d_max + 1
+        self.trains, self.stations = intern_ids(trains_paths)
+        self.train_id = {j: i for i, j in enumerate(self.trains)}
+        self.station_id = {s: i for i, s in enumerate(self.stations)}
+
+        self.blocks = x_blocks(trains_paths)
+        self.blocks_z = z_blocks(trains_paths)
+        self.z_block_id = {block: bz for bz, block in enumerate(self.blocks_z)}
+        if z_active is None:
+            z_active = [np.ones(n ** 2, dtype=bool) for _ in self.blocks_z]
+        self.z_active = [np.asarray(a, dtype=bool) for a in z_active]
+        z_sizes = np.array([np.count_nonzero(a) for a in self.z_active], dtype=np.int64)
+
+        self.q_bits = len(self.blocks) * n
+        self.q_bits_z = int(np.sum(z_sizes))
+        self.x_offsets = np.arange(len(self.blocks), dtype=np.int64) * n
+        self.z_offsets = self.q_bits + np.concatenate([[0], np.cumsum(z_sizes)[:-1]]).astype(np.int64)
+
+        bj = np.array([self.train_id[j] for j, _ in self.blocks], dtype=np.int32)
+        bs = np.array([self.station_id[s] for _, s in self.blocks], dtype=np.int32)
+        zs = np.array([self.station_id[s] for s, _, _ in self.blocks_z], dtype=np.int32)
+        zj = np.array([self.train_id[j] for _, j, _ in self.blocks_z], dtype=np.int32)
+        zj1 = np.array([self.train_id[j1] for _, _, j1 in self.blocks_z], dtype=np.int32)
+        d = np.arange(n, dtype=np.int32)
+        dz = [np.repeat(d, n)[a] for a in self.z_active]
+        dz1 = [np.tile(d, n)[a] for a in self.z_active]
+        none_x = np.full(self.q_bits, -1, dtype=np.int32)
+
+        self.kind = np.concatenate([np.full(self.q_bits, X_VAR, dtype=np.int8), np.full(self.q_bits_z, Z_VAR, dtype=np.int8)])
+        self.train = np.concatenate([np.repeat(bj, n), np.repeat(zj, z_sizes)])
+        self.station = np.concatenate([np.repeat(bs, n), np.repeat(zs, z_sizes)])
+        self.delay = np.concatenate([np.tile(d, len(self.blocks))] + dz).astype(np.int32)
+        self.train1 = np.concatenate([none_x, np.repeat(zj1, z_sizes)])
+        self.delay1 = np.concatenate([none_x] + dz1).astype(np.int32)
+
+        # reverse lookup, starts of x blocks and columns of z blocks (-1 if pruned)
+        self._x_start = {block: int(k) for block, k in zip(self.blocks, self.x_offsets)}
+        self._z_columns = {}
+        for block, k, a in zip(self.blocks_z, self.z_offsets, self.z_active):
+            columns = np.full(n ** 2, -1, dtype=np.int64)
+            columns[a] = k + np.arange(np.count_nonzero(a))
+            self._z_columns[block] = columns
+
+    def __len__(self):
+        return self.q_bits + self.q_bits_z
+
+    def _check_delay(self, d):
+        if not 0 <= d <= self.d_max:
+            raise KeyError(f"delay {d} is not in 0..{self.d_max}")
+
+    def x(self, j, s, d):
+        """ returns column of x variable, train j leaves s at delay d
+
+        raises KeyError if d is not in 0..d_max
+        """
+        self._check_delay(d)
+        return self._x_start[(j, s)] + d
+
+    def z(self, j, j1, s, d, d1):
+        """ returns column of auxiliary variable, j leaves s at d and j1 at d1
+
+        raises KeyError if the variable is pruned or delays are not in 0..d_max
+        """
+        self._check_delay(d)
+        self._check_delay(d1)
+        k = self._z_columns[(s, j, j1)][d * (self.d_max + 1) + d1]
+        if k < 0:
+            raise KeyError(f"auxiliary variable {(j, j1, s, d, d1)} is pruned")
+        return int(k)
+
+    def label(self, k):
+        """ returns ("x", j, s, d) or ("z", j, j1, s, d, d1) label of column k """
+        j = self.trains[self.train[k]]
+        s = self.stations[self.station[k]]
+        if self.kind[k] == X_VAR:
+            return ("x", j, s, int(self.delay[k]))
+        return ("z", j, self.trains[self.train1[k]], s, int(self.delay[k]), int(self.delay1[k]))
+
+    def to_dicts(self):
+        """ returns vector of dicts as concatenated indexing4qubo and z_indices """
+        dicts = []
+        for k in range(len(self)):
+            label = self.label(k)
+            if label[0] == "x":
+                dicts.append({"j": label[1], "s": label[2], "d": label[3]})
+            else:
+                dicts.append({"j": label[1], "j1": label[2], "s": label[3], "d": label[4], "d1": label[5]})
+        return dicts
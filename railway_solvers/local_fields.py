@@ -0,0 +1,76 @@
+""" local fields of QUBO with single bit flip and swap energy deltas for local search """
+import numpy as np
+import scipy.sparse
+from .feasibility import binary_samples
+
+
+class LocalFields():
+    """
+    current assignment v of Q matrix (dense, scipy.sparse or MappedQubo) and
+    local fields h = Q v^T, updated in time proportional to the degree of the
+    flipped variable; not symmetric Q (e.g. upper triangular) is symmetrized
+
+    - v -- current 0/1 assignment (±1 are converted)
+    - h -- local fields, h[i] = ∑_k Q[i, k] v[k]
+    - energy -- v Q v^T of the current assignment
+    """
+
+    def __init__(self, Q, v):
+        if hasattr(Q, "chunks"):
+            Q = Q.to_sparse()
+        self.Q = scipy.sparse.csr_matrix(Q, dtype=np.float64)
+        if (self.Q != self.Q.T).nnz:
+            # e.g. upper triangular Q, the energy is not changed
+            self.Q = scipy.sparse.csr_matrix((self.Q + self.Q.T) / 2)
+        self.Q.sum_duplicates()
+        self.Q.sort_indices()
+        self.diagonal = self.Q.diagonal()
+        self.v = binary_samples(v)[0].copy()
+        self.h = self.Q @ self.v
+        self.energy = float(self.v @ self.h)
+
+    def flip_delta(self, i):
+        """ returns change of the energy if the variable i is flipped """
+        sign = 1.0 - 2.0 * self.v[i]
+        return 2.0 * sign * self.h[i] + self.diagonal[i]
+
+    def flip_deltas(self):
+        """ returns vector of changes of the energy of flips of all variables """
+        return 2.0 * (1.0 - 2.0 * self.v) * self.h + self.diagonal
+
+    def coupling(self, i, k):
+        """ returns Q[i, k], binary search in the row i """
+        start, end = self.Q.indptr[i], self.Q.indptr[i + 1]
+        columns = self.Q.indices[start:end]
+        p = np.searchsorted(columns, k)
+        if p < len(columns) and columns[p] == k:
+            return self.Q.data[start + p]
+        return 0.0
+
+    def swap_delta(self, i, k):
+        """returns change of the energy if values of variables i and k are
+        swapped, e.g. the delay is moved within the block of one-hot variables
+        """
+        if self.v[i] == self.v[k]:
+            return 0.0
+        sign, sign1 = 1.0 - 2.0 * self.v[i], 1.0 - 2.0 * self.v[k]
+        return self.flip_delta(i) + self.flip_delta(k) + 2.0 * sign * sign1 * self.coupling(i, k)
+
+    def flip(self, i):
+        """ flips the variable i, updates fields of its neighbours and the energy,
+        returns the change of the energy
+        """
+        delta = self.flip_delta(i)
+        sign = 1.0 - 2.0 * self.v[i]
+        # Q is symmetric, so the column i is the row i
+        start, end = self.Q.indptr[i], self.Q.indptr[i + 1]
+        self.h[self.Q.indices[start:end]] += sign * self.Q.data[start:end]
+        self.v[i] += sign
+        self.energy += delta
+        return delta
+
+    def swap(self, i, k):
+        """ swaps values of variables i and k, returns the change of the energy """
+        if self.v[i] == self.v[k]:
+            return 0.0
+        return self.flip(i) + self.flip(k)
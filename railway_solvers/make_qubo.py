@@ -5,6 +5,8 @@ import numpy as np
 from .helpers_functions import skip_station, not_the_same_rolling_stock, penalty_weights
 from .helpers_functions import subsequent_station, previous_station, occurs_as_pair, earliest_dep_time
 from .helpers_functions import tau, departure_station4switches, previous_train_from_Jround
+from .vectorized_qubo import make_Qubo_vectorized
+from .terms import qubo_terms
 
 
 # this is the direct QUBO / HOBO implemntation for arXiv:2107.03234
@@ -627,7 +629,7 @@ def get_z_coupling(k, l, jsd_dicts, Problem):
     return J
 
 
-def make_Qubo(Problem):
+def make_Qubo(Problem, format="dense"):  # pylint: disable=redefined-builtin
     """returns symmetric Q matrix for the particular problem encoded in
     Problem.trains_paths and Problem.trains_timing
 
@@ -636,7 +638,18 @@ def make_Qubo(Problem):
     Problem.p_sum -- panalty for ∑_i x_i = 1 hard constrains
     Problem.p_pair -- penalty for ∑_i,j x_i x_j = 0 hard constrains
     Problem.p_qubic -- weight for Rosenberg decomposition of qubic term
-    """
+    format -- "dense" (default) returns list of lists, "sparse" returns
+    scipy.sparse csr_matrix created by the vectorized engine, the memory of
+    which scales with the number of couplers, "terms" returns dict of not
+    weighted sparse term matrices, see qubo_terms and combine_terms
+    """
+    if format == "sparse":
+        return make_Qubo_vectorized(Problem, format="sparse")
+    if format == "terms":
+        return qubo_terms(Problem)
+    if format != "dense":
+        raise ValueError(f"unknown format {format}, use 'dense', 'sparse' or 'terms'")
+
     inds, q_bits = indexing4qubo(Problem.trains_paths, Problem.d_max) # indices of vars
     inds_z, q_bits_z = z_indices(Problem.trains_paths, Problem.d_max) # indices of auxiliary vars.
 
@@ -0,0 +1,107 @@
+""" out-of-core Q matrix, couplers are streamed to memory-mapped files in chunks """
+import os
+import numpy as np
+import scipy.sparse
+from .vectorized_qubo import qubo_index, qubo_couplers
+
+# files of the directory of Q matrix and dtypes of their entries
+_FILES = {"rows": np.int64, "cols": np.int64, "vals": np.float64}
+
+# number of samples evaluated together by MappedQubo.energies
+_SAMPLES_BATCH = 64
+
+
+def write_Qubo(Problem, path, chunk_size=1_000_000, prune_z=False):
+    """writes non-zero entries of symmetric Q matrix of the Problem as COO
+    triplets to the directory path (raw rows.bin, cols.bin, vals.bin and
+    meta.npy with the size and the number of entries)
+
+    entries are buffered and written in chunks of about chunk_size, so the
+    peak memory does not depend on the number of couplers
+
+    prune_z -- see make_Qubo_vectorized
+
+    returns MappedQubo of the written file
+    """
+    os.makedirs(path, exist_ok=True)
+    index = qubo_index(Problem, prune_z)
+    nnz = 0
+    files = {name: open(os.path.join(path, f"{name}.bin"), "wb") for name in _FILES}  # pylint: disable=consider-using-with
+    try:
+        buffer, buffered = [], 0
+        for triplet in qubo_couplers(Problem, index):
+            buffer.append(triplet)
+            buffered += len(triplet[0])
+            if buffered >= chunk_size:
+                nnz += _flush(buffer, files)
+                buffer, buffered = [], 0
+        nnz += _flush(buffer, files)
+    finally:
+        for f in files.values():
+            f.close()
+    np.save(os.path.join(path, "meta.npy"), np.array([len(index), nnz], dtype=np.int64))
+    return MappedQubo(path)
+
+
+def _flush(buffer, files):
+    """ appends buffered triplets to files, returns number of entries """
+    if not buffer:
+        return 0
+    for name, x in zip(_FILES, zip(*buffer)):
+        np.concatenate(x).astype(_FILES[name]).tofile(files[name])
+    return sum(len(rows) for rows, _, _ in buffer)
+
+
+class MappedQubo():
+    """
+    symmetric Q matrix written by write_Qubo, entries are memory-mapped
+    - rows, cols, vals -- COO triplets (np.memmap)
+    - size -- number of variables, nnz -- number of entries
+
+    entries are read lazily, in chunks, see chunks, energy and to_sparse
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size, self.nnz = (int(x) for x in np.load(os.path.join(path, "meta.npy")))
+        self.rows, self.cols, self.vals = (self._mapped(name) for name in _FILES)
+
+    def _mapped(self, name):
+        """ returns memory-mapped entries of the file name """
+        if self.nnz == 0:
+            return np.zeros(0, dtype=_FILES[name])
+        f = os.path.join(self.path, f"{name}.bin")
+        return np.memmap(f, dtype=_FILES[name], mode="r", shape=(self.nnz,))
+
+    @property
+    def shape(self):
+        """ shape of Q matrix """
+        return (self.size, self.size)
+
+    def chunks(self, chunk_size=1_000_000):
+        """ yields (rows, cols, vals) of consecutive chunks of entries """
+        for k in range(0, self.nnz, chunk_size):
+            yield self.rows[k:k + chunk_size], self.cols[k:k + chunk_size], self.vals[k:k + chunk_size]
+
+    def energy(self, v, chunk_size=1_000_000):
+        """ returns v Q v^T of 0/1 vector v computed chunk by chunk """
+        v = np.asarray(v, dtype=float)
+        return sum(np.sum(vals * v[rows] * v[cols]) for rows, cols, vals in self.chunks(chunk_size))
+
+    def energies(self, V, chunk_size=1_000_000):
+        """returns energies of rows of 2-D 0/1 matrix V computed chunk by chunk,
+        samples are taken in batches, so temporaries hold about chunk_size values
+        whatever the number of samples
+        """
+        V = np.atleast_2d(np.asarray(V, dtype=float))
+        batch = max(1, min(len(V), _SAMPLES_BATCH))
+        e = np.zeros(len(V))
+        for rows, cols, vals in self.chunks(max(1, chunk_size // batch)):
+            for k in range(0, len(V), batch):
+                W = V[k:k + batch]
+                e[k:k + batch] += np.sum(vals * W[:, rows] * W[:, cols], axis=1)
+        return e
+
+    def to_sparse(self):
+        """ returns Q as scipy.sparse csr_matrix (loaded into memory) """
+        return scipy.sparse.csr_matrix((self.vals, (self.rows, self.cols)), shape=self.shape)
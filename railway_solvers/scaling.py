@@ -0,0 +1,47 @@
+""" compact dtypes of Q matrix, coefficients scaled to integers by the common denominator """
+import fractions
+import math
+import numpy as np
+import scipy.sparse
+
+
+def integer_scaled(Q, max_denominator=1_000_000, dtype=np.int64, rtol=1e-9):
+    """returns (Q_int, scale), Q matrix (dense or scipy.sparse) with integer
+    entries of dtype and the integer scale, such that Q_int / scale is Q
+
+    coefficients are multiples of p_sum, p_pair, p_qubic and rational penalty
+    weights, each one is approximated by the fraction with the denominator
+    up to max_denominator, the scale is the least common multiple of denominators,
+    energies of Q_int are exact integers
+
+    Raises ValueError if Q_int / scale differs from Q by more than rtol of the
+    largest coefficient (e.g. irrational weights) or if Q_int overflows dtype
+    """
+    values = Q.data if scipy.sparse.issparse(Q) else np.asarray(Q)
+    values = np.unique(values[values != 0])
+    scale = 1
+    for v in values.tolist():
+        denominator = fractions.Fraction(v).limit_denominator(max_denominator).denominator
+        scale = scale * denominator // math.gcd(scale, denominator)
+
+    largest = np.max(np.abs(values)) if len(values) else 0.0
+    if largest * scale > np.iinfo(dtype).max:
+        raise ValueError(f"coefficients scaled by {scale} overflow {np.dtype(dtype)}")
+    scaled = np.rint(values * scale)
+    if np.any(np.abs(scaled / scale - values) > rtol * largest):
+        raise ValueError(f"coefficients are not rational with denominators up to {max_denominator}")
+
+    if scipy.sparse.issparse(Q):
+        Q_int = scipy.sparse.csr_matrix(Q)
+        Q_int = scipy.sparse.csr_matrix((np.rint(Q_int.data * scale).astype(dtype), Q_int.indices, Q_int.indptr),
+                                        shape=Q_int.shape)
+    else:
+        Q_int = np.rint(np.asarray(Q) * scale).astype(dtype)
+    return Q_int, scale
+
+
+def unscaled(Q_int, scale, dtype=np.float64):
+    """ returns Q matrix of dtype from Q_int and scale given by integer_scaled """
+    if scipy.sparse.issparse(Q_int):
+        return scipy.sparse.csr_matrix(scipy.sparse.csr_matrix(Q_int, dtype=np.float64) / scale, dtype=dtype)
+    return (np.asarray(Q_int, dtype=np.float64) / scale).astype(dtype)
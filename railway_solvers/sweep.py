@@ -0,0 +1,94 @@
+""" sweep of penalty weights (p_sum, p_pair, p_qubic) solved by simulated annealing """
+import concurrent.futures
+import itertools
+import numpy as np
+import neal
+from .terms import qubo_terms, combine_terms
+from .bqm import bqm_from_sparse
+from .helpers_functions import energies
+from .compiled import compile_problem, CompiledProblem
+from .feasibility import feasible
+
+SWEEP_COLUMNS = ["p_sum", "p_pair", "p_qubic", "feasible_rate", "best_objective", "best_energy"]
+
+
+def penalty_sweep(Problem, p_sums, p_pairs, p_qubics, num_reads=100, workers=None, seed=None, **sampler_params):
+    """solves the Problem by neal.SimulatedAnnealingSampler for each setting of
+    the grid of weights p_sums x p_pairs x p_qubics
+
+    Q matrices are linear combinations of terms (qubo_terms) computed once.
+    Settings are evaluated in the pool of workers processes (serially if None),
+    terms are sent to each worker once, tasks carry only weights and seeds.
+    sampler_params are passed to the sampler (e.g. num_sweeps).
+
+    returns table, dict of columns (numpy arrays) SWEEP_COLUMNS:
+    - feasible_rate -- fraction of reads that satisfy hard constrains, checked
+      on decoded timetables and auxiliary variables, as in print_no_solutions
+      (see feasible with check_z)
+    - best_objective -- lowest objective (soft constrains) among feasible
+      reads, NaN if there are none
+    - best_energy -- lowest energy of Q
+    """
+    # the compiled Problem is shared by terms and feasibility checks of workers
+    if not isinstance(Problem, CompiledProblem):
+        Problem = compile_problem(Problem)
+    terms = qubo_terms(Problem)
+    settings = list(itertools.product(p_sums, p_pairs, p_qubics))
+    seeds = [None if seed is None else seed + k for k in range(len(settings))]
+    # data common to all settings, sent to each worker once
+    state = (terms, Problem, num_reads, sampler_params)
+
+    if workers is None or workers <= 1:
+        rows = [_solve_setting(state, weights, s) for weights, s in zip(settings, seeds)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(state,)) as executor:
+            rows = list(executor.map(_solve_in_worker, settings, seeds))
+
+    table = {column: np.array([row[k] for row in rows], dtype=float) for k, column in enumerate(SWEEP_COLUMNS)}
+    return table
+
+
+# state of the worker process of penalty_sweep, see _init_worker
+_WORKER_STATE = None
+
+
+def _init_worker(state):
+    """ keeps data common to all settings in the worker process """
+    global _WORKER_STATE  # pylint: disable=global-statement
+    _WORKER_STATE = state
+
+
+def _solve_in_worker(weights, seed):
+    """ _solve_setting with the state of the worker process """
+    return _solve_setting(_WORKER_STATE, weights, seed)
+
+
+def _solve_setting(state, weights, seed):
+    """ returns row of the sweep table for a single setting of weights """
+    terms, Problem, num_reads, sampler_params = state
+    p_sum, p_pair, p_qubic = weights
+    Q = combine_terms(terms, p_sum, p_pair, p_qubic)
+
+    sampleset = neal.SimulatedAnnealingSampler().sample(bqm_from_sparse(Q), num_reads=num_reads, seed=seed,
+                                                        **sampler_params)
+    X = np.zeros((len(sampleset.record), Q.shape[0]))
+    X[:, list(sampleset.variables)] = sampleset.record.sample
+    occurrences = sampleset.record.num_occurrences
+
+    is_feasible = feasible(X, Problem, check_z=True)
+    objectives = energies(X, terms["objective"])
+    best_objective = np.min(objectives[is_feasible]) if np.any(is_feasible) else np.nan
+    rate = np.sum(occurrences[is_feasible]) / np.sum(occurrences)
+    return p_sum, p_pair, p_qubic, rate, best_objective, np.min(energies(X, Q))
+
+
+def save_sweep(table, f):
+    """ saves the table of penalty_sweep to the npz file f """
+    np.savez(f, **table)
+
+
+def load_sweep(f):
+    """ loads the table of penalty_sweep from the npz file f """
+    with np.load(f) as data:
+        return {column: data[column] for column in data.files}
@@ -0,0 +1,121 @@
+""" unweighted term matrices of QUBO, one per constraint family """
+import numpy as np
+import scipy.sparse
+from .indexing import x_blocks
+from .vectorized_qubo import qubo_index, problem_pairs, problem_timing, _rosenberg_xx_mask
+from .vectorized_qubo import sum_block, penalty_block, PAIRWISE_BLOCKS
+from .vectorized_qubo import rosenberg_xx_block, rosenberg_xz_block, track_occupation_block
+
+# families of terms and names of their weights (the objective is not weighted),
+# the order is the order of summation in make_Qubo
+TERMS = {
+    "sum": "p_sum",
+    "headway": "p_pair",
+    "minimal_stay": "p_pair",
+    "single_track": "p_pair",
+    "rolling_stock": "p_pair",
+    "switch": "p_pair",
+    "objective": None,
+    "rosenberg": "p_qubic",
+    "track_occupation": "p_pair",
+}
+
+HARD_TERMS = [family for family in TERMS if family != "objective"]
+
+
+def _term_couplers(Problem, index):
+    """ yields (family, rows, columns, values) of not weighted blocks of terms """
+    trains_paths = Problem.trains_paths
+    d_max = Problem.d_max
+    x0, z0 = index.x_offsets, index.z_offsets
+    timing = problem_timing(Problem)
+    pairs, z_pairs = problem_pairs(Problem)
+
+    def placed(family, row0, col0, J):
+        if J is None:
+            return []
+        r, c = np.nonzero(J)
+        return [(family, row0 + r, col0 + c, J[r, c])]
+
+    for b, b1 in pairs:
+        (j, s), (j1, s1) = index.blocks[b], index.blocks[b1]
+        yield from placed("sum", x0[b], x0[b1], sum_block(j, s, j1, s1, d_max))
+        for family, block in PAIRWISE_BLOCKS.items():
+            yield from placed(family, x0[b], x0[b1], block(j, s, j1, s1, timing, trains_paths, d_max))
+        if b == b1:
+            yield from placed("objective", x0[b], x0[b1], np.diag(penalty_block(j, s, timing, Problem)))
+        R = rosenberg_xx_block(j, s, j1, s1, trains_paths, d_max)
+        mask = _rosenberg_xx_mask(j, s, j1, index) if R is not None else None
+        yield from placed("rosenberg", x0[b], x0[b1], R if mask is None else R * mask)
+
+    for b, bz in z_pairs:
+        (jx, sx), (sz, jz, jz1) = index.blocks[b], index.blocks_z[bz]
+        active = index.z_active[bz]
+        if index.track_blocks is None:
+            P = track_occupation_block(jx, sx, sz, jz, jz1, timing, trains_paths, d_max)
+        else:
+            P = index.track_blocks.get((b, bz))
+        for family, J in [("track_occupation", P), ("rosenberg", rosenberg_xz_block(jx, sx, sz, jz, jz1, d_max))]:
+            if J is not None:
+                yield from placed(family, x0[b], z0[bz], J[:, active])
+                yield from placed(family, z0[bz], x0[b], J[:, active].T)
+
+    for bz in range(len(index.blocks_z)):
+        z = z0[bz] + np.arange(np.count_nonzero(index.z_active[bz]))
+        yield "rosenberg", z, z, np.full(len(z), 3.0)
+
+
+def qubo_terms(Problem, prune_z=False):
+    """returns dict {family: scipy.sparse csr_matrix} of not weighted terms
+    of Q matrix for the particular problem, families are keys of TERMS
+
+    - sum -- ∑_i x_i = 1 condition, see P_sum
+    - headway, minimal_stay, single_track, rolling_stock, switch -- pairwise
+      hard constrains, see P_headway etc.
+    - objective -- soft constrains (penalty), weighted by penalty_weights
+    - rosenberg -- Rosenberg decomposition, see P_Rosenberg_decomposition
+    - track_occupation -- see P_track_occupation_condition_quadratic_part
+
+    Q matrix is given by combine_terms
+    """
+    index = qubo_index(Problem, prune_z)
+    size = len(index)
+    parts = {family: [] for family in TERMS}
+    for family, rows, cols, vals in _term_couplers(Problem, index):
+        parts[family].append((rows, cols, vals))
+
+    terms = {}
+    for family, triplets in parts.items():
+        if triplets:
+            rows, cols, vals = (np.concatenate(x) for x in zip(*triplets))
+        else:
+            rows, cols, vals = np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+        terms[family] = scipy.sparse.csr_matrix((vals, (rows, cols)), shape=(size, size))
+    return terms
+
+
+def combine_terms(terms, p_sum, p_pair, p_qubic, families=None):
+    """returns weighted sum of terms given by qubo_terms as scipy.sparse csr_matrix,
+
+    terms are summed in the order of TERMS, so the result is identical with
+    make_Qubo(Problem, format="sparse") for weights of the Problem
+
+    families -- if given, only these families are summed, e.g. hard constrains
+    for the feasibility check, see HARD_TERMS; no families give zero matrix
+    """
+    weights = {"p_sum": p_sum, "p_pair": p_pair, "p_qubic": p_qubic}
+    Q = scipy.sparse.csr_matrix(terms["sum"].shape)
+    for family, weight in TERMS.items():
+        if families is not None and family not in families:
+            continue
+        T = terms[family] if weight is None else weights[weight] * terms[family]
+        Q = Q + T
+    Q.eliminate_zeros()
+    return Q
+
+
+def feasibility_offset(trains_paths, p_sum):
+    """returns the energy of feasible solutions of hard constrains, i.e. with no
+    soft constrains; it is non zero due to ∑_i x_i = 1 terms, -p_sum per block
+    """
+    return -p_sum * len(x_blocks(trains_paths))
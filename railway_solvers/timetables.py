@@ -0,0 +1,67 @@
+""" batch decoder of samples to the columnar table of timetables """
+import csv
+import os
+import numpy as np
+from .vectorized_qubo import qubo_index, problem_timing
+from .feasibility import binary_samples
+
+TIMETABLE_COLUMNS = ["sample_id", "train", "station", "delay", "departure_time", "objective"]
+
+
+def decode_timetables(samples, Problem, index=None):
+    """returns table, dict of columns (numpy arrays) TIMETABLE_COLUMNS, of all
+    x variables equal to 1 in samples (0/1 or ±1, rows of 2-D matrix),
+    i.e. train leaves station at delay
+
+    - sample_id -- row of the sample
+    - departure_time -- delay + earliest departure time, see earliest_dep_times
+    - objective -- contribution to soft constrains (not weighted by p_sum etc.),
+      see penalty_block
+
+    columns of samples are given by index, qubo_index(Problem) by default
+    """
+    index = qubo_index(Problem) if index is None else index
+    timing = problem_timing(Problem)
+    n = index.d_max + 1
+    ids = [timing.ids(j, s) for j, s in index.blocks]
+    dep_time = np.array([timing.dep_time[i] for i in ids])
+    weight = np.array([timing.weight[i] for i in ids]) / Problem.d_max if Problem.d_max else np.zeros(len(ids))
+
+    V = binary_samples(samples)
+    sample_id, k = np.nonzero(V[:, :index.q_bits] == 1)
+    block, delay = k // n, k % n
+    trains = np.array([j for j, _ in index.blocks])
+    stations = np.array([s for _, s in index.blocks])
+    return {
+        "sample_id": sample_id,
+        "train": trains[block],
+        "station": stations[block],
+        "delay": delay,
+        "departure_time": dep_time[block] + delay,
+        "objective": weight[block] * delay,
+    }
+
+
+def save_timetables(table, f):
+    """saves the table of decode_timetables to the file f, the format is
+    given by the extension: .npz, .csv or .parquet (requires pandas)
+    """
+    extension = os.path.splitext(str(f))[1]
+    if extension == ".npz":
+        np.savez(f, **table)
+    elif extension == ".csv":
+        with open(f, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(TIMETABLE_COLUMNS)
+            writer.writerows(zip(*(table[column].tolist() for column in TIMETABLE_COLUMNS)))
+    elif extension == ".parquet":
+        import pandas  # pylint: disable=import-outside-toplevel
+        pandas.DataFrame({column: table[column] for column in TIMETABLE_COLUMNS}).to_parquet(f)
+    else:
+        raise ValueError(f"unknown format {extension}, use '.npz', '.csv' or '.parquet'")
+
+
+def load_timetables(f):
+    """ loads the table of decode_timetables from the npz file f """
+    with np.load(f) as data:
+        return {column: data[column] for column in TIMETABLE_COLUMNS}
@@ -0,0 +1,154 @@
+""" compiled trains timing, time spans are stored in arrays indexed by integer ids """
+import numpy as np
+from .helpers_functions import earliest_dep_times, rolling_stock_partners
+
+
+def intern_ids(trains_paths):
+    """returns vectors of trains and of stations, positions in these vectors
+    are dense integer ids of trains and stations
+
+    trains are ordered as in trains_paths["J"], stations in the order of
+    appearance on trains paths
+    """
+    S = trains_paths["Paths"]
+    J = set(trains_paths["J"])
+    trains = list(trains_paths["J"]) + [j for j in S if j not in J]
+    stations = list(dict.fromkeys(s for j in trains for s in S[j]))
+    return trains, stations
+
+
+class TimingModel():
+    """
+    trains_timing compiled once for given trains_paths
+
+    trains and stations are mapped to dense integer ids
+    - train_id -- {j: id}, trains -- vector of trains, trains[train_id[j]] = j
+    - station_id -- {s: id}, stations -- vector of stations
+
+    time spans are arrays indexed by [train id, station id]
+    - pass_time -- τ^pass from the station to the subsequent station on the path
+    - next_station -- id of subsequent station on the path (or -1)
+    - stop_time -- τ^stop at the station
+    - prep_time -- τ^prep at the station
+    - dep_time -- earliest departure time, see earliest_dep_times
+    - weight -- penalty weights of the objective, see penalty_weights
+    - headway_time -- dict {(j id, j1 id, s id, s1 id): τ^headway}
+    - res -- τ^res
+
+    sets of trains are indexed by trains, so that pairs of trains check only
+    their own entries
+    - switches -- {frozenset((j, j1)): [(s, place_of_switch), ...]} common
+      switches of trains j, j1 in the order of trains_paths["Jswitch"]
+    - rolling_stock -- {j: set of trains served by the same rolling stock},
+      see rolling_stock_partners
+
+    entries that are not given in trains_timing are NaN, while using them
+    by methods below raises KeyError as in the case of tau
+    """
+
+    def __init__(self, trains_paths, trains_timing):
+        S = trains_paths["Paths"]
+        taus = trains_timing["tau"]
+
+        self.trains, self.stations = intern_ids(trains_paths)
+        self.train_id = {j: i for i, j in enumerate(self.trains)}
+        self.station_id = {s: i for i, s in enumerate(self.stations)}
+
+        shape = (len(self.trains), len(self.stations))
+        self.pass_time = np.full(shape, np.nan)
+        self.next_station = np.full(shape, -1, dtype=int)
+        self.stop_time = np.full(shape, np.nan)
+        self.prep_time = np.full(shape, np.nan)
+        self.dep_time = np.full(shape, np.nan)
+        self.weight = np.zeros(shape)
+        self.headway_time = {}
+        self.res = taus.get("res", np.nan)
+
+        for j in self.trains:
+            tj = self.train_id[j]
+            for s, s1 in zip(S[j][:-1], S[j][1:]):
+                ts = self.station_id[s]
+                self.next_station[tj, ts] = self.station_id[s1]
+                self.pass_time[tj, ts] = taus.get("pass", {}).get(f"{j}_{s}_{s1}", np.nan)
+            for s in S[j]:
+                ts = self.station_id[s]
+                self.stop_time[tj, ts] = taus.get("stop", {}).get(f"{j}_{s}", np.nan)
+                self.prep_time[tj, ts] = taus.get("prep", {}).get(f"{j}_{s}", np.nan)
+
+        self.update_trains(trains_paths, trains_timing, trains_paths["J"])
+
+        for s, Jd_s in trains_paths.get("Jd", {}).items():
+            for s1, groups in Jd_s.items():
+                for js in groups:
+                    for j in js:
+                        for j1 in js:
+                            key = f"{j}_{j1}_{s}_{s1}"
+                            if key in taus.get("headway", {}):
+                                ids = (self.train_id[j], self.train_id[j1], self.station_id[s], self.station_id[s1])
+                                self.headway_time[ids] = taus["headway"][key]
+
+        self.switches = {}
+        for s, switches in trains_paths.get("Jswitch", {}).items():
+            for place_of_switch in switches:
+                if len(place_of_switch) == 2:
+                    self.switches.setdefault(frozenset(place_of_switch), []).append((s, place_of_switch))
+
+        self.rolling_stock = rolling_stock_partners(trains_paths)
+
+    def update_trains(self, trains_paths, trains_timing, trains):
+        """recomputes earliest departure times and penalty weights of given
+        trains, e.g. after the change of initial conditions or of the schedule
+        """
+        S = trains_paths["Paths"]
+        trains = list(trains)
+        for j in trains:
+            tj = self.train_id[j]
+            self.dep_time[tj, :] = np.nan
+            for s in S[j]:
+                self.weight[tj, self.station_id[s]] = trains_timing.get("penalty_weights", {}).get(f"{j}_{s}", 0.0)
+
+        for (j, s), t in earliest_dep_times(dict(trains_paths, J=trains), trains_timing).items():
+            self.dep_time[self.train_id[j], self.station_id[s]] = t
+
+    def ids(self, j, s):
+        """ returns ids of train j and station s, raises KeyError if unknown """
+        return self.train_id[j], self.station_id[s]
+
+    def not_the_same_rolling_stock(self, j, j1):
+        """ checks if trains j, j1 (not ids) are not served by the same rolling stock """
+        return j1 not in self.rolling_stock.get(j, ())
+
+    def passing(self, j, s, s1):
+        """ τ^pass of train j from station s to station s1, given ids """
+        if self.next_station[j, s] != s1 or np.isnan(self.pass_time[j, s]):
+            raise KeyError(f"pass {self.trains[j]}_{self.stations[s]}_{self.stations[s1]}")
+        return self.pass_time[j, s]
+
+    def stop(self, j, s):
+        """ τ^stop of train j at station s, given ids """
+        return _checked(self.stop_time[j, s], f"stop {self.trains[j]}_{self.stations[s]}")
+
+    def prep(self, j, s):
+        """ τ^prep of train j at station s, given ids """
+        return _checked(self.prep_time[j, s], f"prep {self.trains[j]}_{self.stations[s]}")
+
+    def dep(self, j, s):
+        """ earliest departure time of train j from station s, given ids """
+        return _checked(self.dep_time[j, s], f"earliest departure {self.trains[j]}_{self.stations[s]}")
+
+    def headway(self, j, j1, s, s1):
+        """ τ^headway of train j1 following j from s to s1, given ids """
+        if (j, j1, s, s1) not in self.headway_time:
+            raise KeyError(f"headway {self.trains[j]}_{self.trains[j1]}_{self.stations[s]}_{self.stations[s1]}")
+        return self.headway_time[(j, j1, s, s1)]
+
+    def reservation(self):
+        """ τ^res """
+        return _checked(self.res, "res")
+
+
+def _checked(value, key):
+    """ raises KeyError if the value is missing (NaN) """
+    if np.isnan(value):
+        raise KeyError(key)
+    return value
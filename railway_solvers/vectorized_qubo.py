@@ -0,0 +1,882 @@
+""" vectorized QUBO creation, constrains are computed on whole blocks of delays """
+import concurrent.futures
+import functools
+import itertools
+import numpy as np
+import scipy.sparse
+from .helpers_functions import subsequent_station, previous_station, occurs_as_pair
+from .helpers_functions import departure_station4switches, previous_train_from_Jround
+from .timing import TimingModel
+from .indexing import QuboIndex, x_blocks, z_blocks
+
+
+# Variables are grouped in blocks of d_max + 1 delays, x variables in blocks
+# (j, s) and auxiliary variables in blocks (s, j, j1) of (d_max + 1)^2 delays
+# pairs (d, d1). Each constrain is evaluated once per pair of blocks as array
+# operation over the grid of delays. The order of variables and the arithmetic
+# follows make_qubo.py so that the resulting Q matrix is bit-identical.
+
+
+def _pairs(js):
+    """ ordered pairs of distinct trains in the group """
+    return [(j, j1) for j, j1 in itertools.permutations(js, 2) if j != j1]
+
+
+def interacting_blocks(trains_paths):
+    """returns sorted vector of pairs of indices (b, b1) of x_blocks that may
+    interact through any constrain, both (b, b1) and (b1, b) are included
+
+    Pairs are generated from sets Jd, Josingle, Jround, Jswitch, Jtrack and
+    from subsequent stations of the same train, all other pairs of blocks
+    give zero contribution to Qmat.
+    """
+    S = trains_paths["Paths"]
+    blocks = x_blocks(trains_paths)
+    position = {block: b for b, block in enumerate(blocks)}
+    pairs = set()
+
+    def add(block, block1):
+        if block in position and block1 in position:
+            pairs.add((position[block], position[block1]))
+            pairs.add((position[block1], position[block]))
+
+    for (j, s) in blocks:
+        # sum to one and minimal stay
+        add((j, s), (j, s))
+        add((j, s), (j, subsequent_station(S[j], s)))
+    for s, Jd_s in trains_paths.get("Jd", {}).items():
+        for js in itertools.chain(*Jd_s.values()):
+            for j, j1 in _pairs(js):
+                add((j, s), (j1, s))
+    for (s, s1), js in trains_paths.get("Josingle", {}).items():
+        for j, j1 in js:
+            add((j, s), (j1, s1))
+    for s1, js in trains_paths.get("Jround", {}).items():
+        for j, j1 in js:
+            if s1 in S[j]:
+                add((j, previous_station(S[j], s1)), (j1, s1))
+    for s, switches in trains_paths.get("Jswitch", {}).items():
+        for pairs_of_switch in switches:
+            for j, j1 in _pairs(list(pairs_of_switch.keys())):
+                sp = departure_station4switches(s, j, pairs_of_switch, trains_paths)
+                spp = departure_station4switches(s, j1, pairs_of_switch, trains_paths)
+                add((j, sp), (j1, spp))
+    for s, groups in trains_paths.get("Jtrack", {}).items():
+        for js in groups:
+            for j, j1 in _pairs(js):
+                add((j, s), (j1, s))
+    return sorted(pairs)
+
+
+def interacting_z_blocks(trains_paths):
+    """returns sorted vector of pairs of indices (b, bz) of x_blocks and
+    z_blocks that may interact through track occupation condition or
+    Rosenberg decomposition, all other pairs give zero contribution to Qmat
+    """
+    S = trains_paths["Paths"]
+    blocks = x_blocks(trains_paths)
+    position = {block: b for b, block in enumerate(blocks)}
+    pairs = set()
+
+    for bz, (sz, jz, jz1) in enumerate(z_blocks(trains_paths)):
+        candidates = []
+        for j in (jz, jz1):
+            # Rosenberg decomposition and track occupation
+            candidates.append((j, sz))
+            if sz in S[j]:
+                candidates.append((j, previous_station(S[j], sz)))
+            if previous_train_from_Jround(trains_paths, j, sz) == j:
+                # the train of x variable is not restricted in such case
+                candidates += [(jx, previous_station(S[jx], sz)) for jx in trains_paths["J"] if sz in S[jx]]
+        for block in candidates:
+            if block in position:
+                pairs.add((position[block], bz))
+    return sorted(pairs)
+
+
+def problem_pairs(Problem):
+    """ returns (interacting_blocks, interacting_z_blocks) of the Problem,
+    precomputed ones if Problem is compiled, see compile_problem
+    """
+    pairs = getattr(Problem, "pairs", None)
+    if pairs is not None:
+        return pairs, Problem.z_pairs
+    return interacting_blocks(Problem.trains_paths), interacting_z_blocks(Problem.trains_paths)
+
+
+def problem_timing(Problem):
+    """ returns TimingModel of the Problem, precomputed one if Problem is
+    compiled, see compile_problem
+    """
+    timing = getattr(Problem, "timing", None)
+    if timing is not None:
+        return timing
+    return TimingModel(Problem.trains_paths, Problem.trains_timing)
+
+
+# Pairwise conditions depend on delays only through the difference d1 - d,
+# where d is the delay of the first block (rows) and d1 of the second one
+# (columns). Each of them is penalised on the open interval lo < d1 - d < hi
+# and the block is filled as a band of the matrix of differences. Times are
+# assumed to be exactly representable (e.g. integers), then the band is
+# identical with the direct comparison of departure times.
+
+
+@functools.lru_cache(maxsize=None)
+def _differences(d_max):
+    """ returns (d_max + 1) x (d_max + 1) matrix of d1 - d """
+    d = np.arange(d_max + 1)
+    diff = d[None, :] - d[:, None]
+    diff.flags.writeable = False
+    return diff
+
+
+def band(intervals, d_max):
+    """returns (d_max + 1) x (d_max + 1) not weighted contribution to Qmat
+    from the vector of open intervals (lo, hi) of penalised d1 - d,
+    contributions of intervals are summed
+
+    returns None if there are no intervals
+    """
+    if not intervals:
+        return None
+    diff = _differences(d_max)
+    return sum(((lo < diff) & (diff < hi)).astype(float) for lo, hi in intervals)
+
+
+def _reversed(intervals):
+    """ intervals of d - d1 given intervals of d1 - d """
+    return [(-hi, -lo) for lo, hi in intervals]
+
+
+################# constrains on blocks #####################
+
+def sum_block(j, s, j1, s1, d_max):
+    """
+    Sum to one conditon - Eq. (41) on the block of delays
+
+    returns not weighted (d_max + 1) x (d_max + 1) contribution to Qmat
+    or None if blocks do not interact
+    """
+    if j == j1 and s == s1:
+        return np.ones((d_max + 1, d_max + 1)) - 2 * np.eye(d_max + 1)
+    return None
+
+
+def headway_intervals(j, s, j1, s1, timing, trains_paths):
+    """
+    Minimal headway condition - Eq. (42), see P_headway
+
+    returns vector of intervals (lo, hi) such that lo < d1 - d < hi is penalised
+    (empty if blocks do not interact)
+    """
+    S = trains_paths["Paths"]
+    s_next = subsequent_station(S[j], s)
+    Jd = trains_paths.get("Jd", {})
+
+    if s == s1 and s_next and s_next == subsequent_station(S[j1], s1):
+        if s in Jd.keys() and s_next in Jd[s].keys():
+            if occurs_as_pair(j, j1, Jd[s][s_next]):
+                tj, ts = timing.ids(j, s)
+                tj1, ts_next = timing.ids(j1, s_next)
+                t = timing.dep(tj, ts)
+                t1 = timing.dep(tj1, ts)
+
+                A = -timing.headway(tj1, tj, ts, ts_next)
+                B = timing.headway(tj, tj1, ts, ts_next)
+
+                return [(A - (t1 - t), B - (t1 - t))]
+    return []
+
+
+def headway_block(j, s, j1, s1, timing, trains_paths, d_max):
+    """
+    Minimal headway condition - Eq. (42) on the block of delays
+
+    see P_headway, returns not weighted contribution to Qmat
+    or None if blocks do not interact
+    """
+    return band(headway_intervals(j, s, j1, s1, timing, trains_paths), d_max)
+
+
+def single_track_intervals(j, s, j1, s1, timing, trains_paths):
+    """
+    Single track line condition - Eq. (43), see penalty_single_track
+    (not symmetrised)
+
+    returns vector of intervals (lo, hi) such that lo < d1 - d < hi is penalised
+    (empty if blocks do not interact)
+    """
+    Josingle = trains_paths.get("Josingle", {})
+
+    if timing.not_the_same_rolling_stock(j, j1):
+        if (s, s1) in Josingle.keys() and [j, j1] in Josingle[(s, s1)]:
+            tj, ts = timing.ids(j, s)
+            tj1, ts1 = timing.ids(j1, s1)
+            t = timing.dep(tj, ts)
+            t1 = timing.dep(tj1, ts1)
+
+            lo = t - timing.passing(tj1, ts1, ts)
+            hi = t + timing.passing(tj, ts, ts1)
+
+            return [(lo - t1, hi - t1)]
+    return []
+
+
+def single_track_block(j, s, j1, s1, timing, trains_paths, d_max):
+    """
+    Single track line condition - Eq. (43) on the block of delays
+
+    see P_single_track_line, returns not weighted contribution to Qmat
+    or None if blocks do not interact
+    """
+    intervals = single_track_intervals(j, s, j1, s1, timing, trains_paths)
+    intervals += _reversed(single_track_intervals(j1, s1, j, s, timing, trains_paths))
+    return band(intervals, d_max)
+
+
+def minimal_stay_intervals(j, s, j1, s1, timing, trains_paths):
+    """
+    Minimal stay condition - Eq. (44), see penalty_minimal_stay
+    (not symmetrised)
+
+    returns vector of intervals (lo, hi) such that lo < d1 - d < hi is penalised
+    (empty if blocks do not interact)
+    """
+    S = trains_paths["Paths"]
+    if j == j1 and s1 == subsequent_station(S[j], s):
+        tj, ts = timing.ids(j, s)
+        ts1 = timing.station_id[s1]
+        lhs = timing.dep(tj, ts1)
+
+        rhs = timing.dep(tj, ts)
+        rhs += timing.passing(tj, ts, ts1)
+        rhs += timing.stop(tj, ts1)
+
+        return [(-np.inf, rhs - lhs)]
+    return []
+
+
+def minimal_stay_block(j, s, j1, s1, timing, trains_paths, d_max):
+    """
+    Minimal stay condition - Eq. (44) on the block of delays
+
+    see P_minimal_stay, returns not weighted contribution to Qmat
+    or None if blocks do not interact
+    """
+    intervals = minimal_stay_intervals(j, s, j1, s1, timing, trains_paths)
+    intervals += _reversed(minimal_stay_intervals(j1, s1, j, s, timing, trains_paths))
+    return band(intervals, d_max)
+
+
+def rolling_stock_intervals(j, s, j1, s1, timing, trains_paths):
+    """
+    Rolling stock circulation condition - Eq. (45), see penalty_rolling_stock
+    (not symmetrised)
+
+    returns vector of intervals (lo, hi) such that lo < d1 - d < hi is penalised
+    (empty if blocks do not interact)
+    """
+    S = trains_paths["Paths"]
+    Jround = trains_paths.get("Jround", {})
+
+    if s1 in Jround.keys() and s1 in S[j]:
+        if previous_station(S[j], s1) == s and [j, j1] in Jround[s1]:
+            tj, ts = timing.ids(j, s)
+            tj1, ts1 = timing.ids(j1, s1)
+            lhs = timing.dep(tj, ts)
+            lhs += timing.prep(tj1, ts1)
+            lhs += timing.passing(tj, ts, ts1)
+            rhs = timing.dep(tj1, ts1)
+            return [(-np.inf, lhs - rhs)]
+    return []
+
+
+def rolling_stock_block(j, s, j1, s1, timing, trains_paths, d_max):
+    """
+    Rolling stock circulation condition - Eq. (45) on the block of delays
+
+    see P_rolling_stock_circulation, returns not weighted contribution to Qmat
+    or None if blocks do not interact
+    """
+    intervals = rolling_stock_intervals(j, s, j1, s1, timing, trains_paths)
+    intervals += _reversed(rolling_stock_intervals(j1, s1, j, s, timing, trains_paths))
+    return band(intervals, d_max)
+
+
+def switch_intervals(jp, sp, jpp, spp, timing, trains_paths):
+    """
+    Switch occupancy condition - Eq. (46), see P_switch_occupation
+
+    returns vector of intervals (lo, hi) such that lo < d1 - d < hi is penalised
+    (empty if blocks do not interact), one interval for each common switch
+    """
+    intervals = []
+
+    if timing.not_the_same_rolling_stock(jp, jpp):
+        for s, pairs_of_switch in timing.switches.get(frozenset((jp, jpp)), []):
+            if sp == departure_station4switches(s, jp, pairs_of_switch, trains_paths):
+                if spp == departure_station4switches(s, jpp, pairs_of_switch, trains_paths):
+                    tjp, tsp = timing.ids(jp, sp)
+                    tjpp, tspp = timing.ids(jpp, spp)
+                    ts = timing.station_id[s]
+                    t = timing.dep(tjp, tsp)
+                    if s != sp:
+                        t += timing.passing(tjp, tsp, ts)
+
+                    t1 = timing.dep(tjpp, tspp)
+                    if s != spp:
+                        t1 += timing.passing(tjpp, tspp, ts)
+
+                    res = timing.reservation()
+                    intervals.append((-res - (t1 - t), res - (t1 - t)))
+    return intervals
+
+
+def switch_block(jp, sp, jpp, spp, timing, trains_paths, d_max):
+    """
+    Switch occupancy condition - Eq. (46) on the block of delays
+
+    see P_switch_occupation, returns not weighted contribution to Qmat
+    or None if blocks do not interact
+    """
+    P = band(switch_intervals(jp, sp, jpp, spp, timing, trains_paths), d_max)
+    if P is None:
+        return None
+    # penalty is not summed over switches
+    return np.minimum(P, 1.0)
+
+
+PAIRWISE_CONDITIONS = {
+    "headway": headway_intervals,
+    "single_track": single_track_intervals,
+    "minimal_stay": minimal_stay_intervals,
+    "rolling_stock": rolling_stock_intervals,
+    "switch": switch_intervals,
+}
+
+# not weighted blocks of pairwise hard constrains, in the order of summation in make_Qubo
+PAIRWISE_BLOCKS = {
+    "headway": headway_block,
+    "minimal_stay": minimal_stay_block,
+    "single_track": single_track_block,
+    "rolling_stock": rolling_stock_block,
+    "switch": switch_block,
+}
+
+
+def conflict_intervals(Problem):
+    """returns vector of dicts describing penalised delay differences for each
+    ordered and interacting pair of blocks (j, s), (j1, s1) and each pairwise
+    condition
+
+    {"condition": c, "j": j, "s": s, "j1": j1, "s1": s1, "lo": lo, "hi": hi}
+
+    delays d of j at s and d1 of j1 at s1 are in conflict if lo < d1 - d < hi.
+    The width of the interval tells how tight the conflict is. The track
+    occupation condition is qubic, it is not described by a single difference.
+    """
+    trains_paths = Problem.trains_paths
+    blocks = x_blocks(trains_paths)
+    timing = problem_timing(Problem)
+    conflicts = []
+    for b, b1 in problem_pairs(Problem)[0]:
+        (j, s), (j1, s1) = blocks[b], blocks[b1]
+        for condition, intervals in PAIRWISE_CONDITIONS.items():
+            for lo, hi in intervals(j, s, j1, s1, timing, trains_paths):
+                conflicts.append({"condition": condition, "j": j, "s": s, "j1": j1, "s1": s1, "lo": float(lo), "hi": float(hi)})
+    return conflicts
+
+
+##### track occupancy condition  on blocks ####
+
+def rosenberg_xx_block(j, s, j1, s1, trains_paths, d_max):
+    """
+    the x vs x contribution from Rosenberg decomposition Eq. (52)
+    on the block of delays, see P_Rosenberg_decomposition
+
+    returns not weighted contribution to Qmat or None if blocks do not interact
+    """
+    Jtrack = trains_paths["Jtrack"]
+    if s == s1 and s in Jtrack.keys():
+        if occurs_as_pair(j, j1, Jtrack[s]):
+            return 0.5 * np.ones((d_max + 1, d_max + 1))
+    return None
+
+
+def rosenberg_xz_block(jx, sx, sz, jz, jz1, d_max):
+    """
+    the x vs z contribution from Rosenberg decomposition Eq. (52)
+    on the block of delays, see P_Rosenberg_decomposition
+
+    returns not weighted (d_max + 1) x (d_max + 1)^2 contribution to Qmat
+    (z variables are flattened, with d1 changing faster)
+    or None if blocks do not interact
+    """
+    if sz != sx or jx not in (jz, jz1):
+        return None
+    d = np.arange(d_max + 1)
+    dz, dz1 = np.meshgrid(d, d, indexing="ij")
+    if jx == jz:
+        mask = d[:, None] == dz.ravel()[None, :]
+    else:
+        mask = d[:, None] == dz1.ravel()[None, :]
+    return -1.0 * mask
+
+
+def _one_track_mask(jx, jz, jz1, sx, sz, timing, trains_paths, d_max):
+    """ helper for track_occupation_block, see one_track_constrains
+
+    returns mask indexed by [d, d1, d2]
+    """
+    d = np.arange(d_max + 1)
+
+    tjx, tsx = timing.ids(jx, sx)
+    tjz, tsz = timing.ids(jz, sz)
+    tjz1 = timing.train_id[jz1]
+
+    tx = d + timing.dep(tjx, tsx)
+    tx = tx + timing.passing(tjx, tsx, tsz)
+    if "add_swithes_at_s" in trains_paths.keys():
+        if sz in trains_paths["add_swithes_at_s"]:
+            tx = tx - timing.reservation()
+    tz = d + timing.dep(tjz, tsz)
+    tz1 = d + timing.dep(tjz1, tsz)
+
+    return (tx[:, None, None] < tz1[None, None, :]) & (tz1[None, None, :] <= tz[None, :, None])
+
+
+def track_occupation_block(jx, sx, sz, jz, jz1, timing, trains_paths, d_max):
+    """
+    A quadratic part of track occupartion condition, first term in Eq. (53)
+    on the block of delays, see P_track_occupation_condition_quadratic_part
+
+    returns not weighted (d_max + 1) x (d_max + 1)^2 contribution to Qmat
+    (z variables are flattened, with d1 changing faster)
+    or None if blocks do not interact
+    """
+    S = trains_paths["Paths"]
+    Jtrack = trains_paths["Jtrack"]
+
+    if not timing.not_the_same_rolling_stock(jx, jz):
+        return None
+    if sz != subsequent_station(S[jx], sx):
+        return None
+
+    mask = None
+    j_rr = previous_train_from_Jround(trains_paths, jz, sz)
+    if j_rr is None:
+        if jx == jz and occurs_as_pair(jx, jz1, Jtrack[sz]):
+            mask = _one_track_mask(jx, jz, jz1, sx, sz, timing, trains_paths, d_max)
+    elif j_rr == jz and occurs_as_pair(j_rr, jz1, Jtrack[sz]):
+        mask = _one_track_mask(j_rr, jz, jz1, sx, sz, timing, trains_paths, d_max)
+
+    j_rr = previous_train_from_Jround(trains_paths, jz1, sz)
+    m = None
+    if j_rr is None:
+        if jx == jz1 and occurs_as_pair(jx, jz, Jtrack[sz]):
+            m = _one_track_mask(jx, jz1, jz, sx, sz, timing, trains_paths, d_max)
+    elif j_rr == jz1 and occurs_as_pair(j_rr, jz, Jtrack[sz]):
+        m = _one_track_mask(j_rr, jz1, jz, sx, sz, timing, trains_paths, d_max)
+
+    if m is not None:
+        # arguments of z are swapped, d1 <-> d2
+        m = m.transpose(0, 2, 1)
+        mask = m if mask is None else mask | m
+
+    if mask is None:
+        return None
+    return mask.reshape(d_max + 1, (d_max + 1) ** 2).astype(float)
+
+
+################# blocks couplings ###################
+
+def penalty_block(j, s, timing, Problem):
+    """
+    Soft constrians on the block of delays, see penalty
+
+    Returns weighted contribution to the diagonal of Qmat, timing is TimingModel
+    """
+    w = timing.weight[timing.ids(j, s)] / Problem.d_max
+    return np.arange(Problem.d_max + 1) * w
+
+
+def get_block_coupling(block, block1, Problem, timing):
+    """ returns weighted hard constrains contributions to Qmat at the pair of
+    blocks of x variables: sum, headway, minimal stay, single_line, circulation, switch
+
+    timing is TimingModel compiled from Problem.trains_timing
+
+    or None if blocks do not interact, see get_coupling
+    """
+    j, s = block
+    j1, s1 = block1
+    trains_paths = Problem.trains_paths
+    d_max = Problem.d_max
+
+    J = None
+    # the order of summation is as in get_coupling
+    for weight, P in [
+        (Problem.p_sum, sum_block(j, s, j1, s1, d_max)),
+        (Problem.p_pair, headway_block(j, s, j1, s1, timing, trains_paths, d_max)),
+        (Problem.p_pair, minimal_stay_block(j, s, j1, s1, timing, trains_paths, d_max)),
+        (Problem.p_pair, single_track_block(j, s, j1, s1, timing, trains_paths, d_max)),
+        (Problem.p_pair, rolling_stock_block(j, s, j1, s1, timing, trains_paths, d_max)),
+        (Problem.p_pair, switch_block(j, s, j1, s1, timing, trains_paths, d_max)),
+    ]:
+        if P is not None:
+            J = weight * P if J is None else J + weight * P
+    return J
+
+
+def get_block_z_coupling(block, z_block, Problem, timing):
+    """ returns weighted hard constrains contributions to Qmat at the pair of
+    block of x variables and block of auxiliary variables: track occupation
+    and Rosenberg decomposition
+
+    timing is TimingModel compiled from Problem.trains_timing
+
+    or None if blocks do not interact, see get_z_coupling
+    """
+    jx, sx = block
+    sz, jz, jz1 = z_block
+    P = track_occupation_block(jx, sx, sz, jz, jz1, timing, Problem.trains_paths, Problem.d_max)
+    return _z_coupling(block, z_block, P, Problem)
+
+
+def _z_coupling(block, z_block, P, Problem):
+    """ weighted sum of track occupation block P and Rosenberg decomposition,
+    see get_block_z_coupling
+    """
+    jx, sx = block
+    sz, jz, jz1 = z_block
+    d_max = Problem.d_max
+    R = rosenberg_xz_block(jx, sx, sz, jz, jz1, d_max)
+
+    if P is None and R is None:
+        return None
+    J = np.zeros((d_max + 1, (d_max + 1) ** 2))
+    if P is not None:
+        J = Problem.p_pair * P
+    if R is not None:
+        J = J + Problem.p_qubic * R
+    return J
+
+
+def _triplets(row0, col0, J):
+    """ returns rows, columns and values of non-zero entries of the block J
+    placed at (row0, col0) of Qmat
+    """
+    r, c = np.nonzero(J)
+    return row0 + r, col0 + c, J[r, c]
+
+
+def track_blocks(Problem, timing=None):
+    """ returns dict {(b, bz): track_occupation_block} of interacting blocks of
+    x variables and auxiliary variables, blocks that do not interact are skipped
+    """
+    trains_paths = Problem.trains_paths
+    blocks, blocks_z = x_blocks(trains_paths), z_blocks(trains_paths)
+    if timing is None:
+        timing = problem_timing(Problem)
+    P = {}
+    for b, bz in problem_pairs(Problem)[1]:
+        (jx, sx), (sz, jz, jz1) = blocks[b], blocks_z[bz]
+        J = track_occupation_block(jx, sx, sz, jz, jz1, timing, trains_paths, Problem.d_max)
+        if J is not None:
+            P[(b, bz)] = J
+    return P
+
+
+def active_z(Problem, timing=None, track=None):
+    """returns vector of boolean masks, one per z_blocks, of auxiliary variables
+    that enter track occupation condition for some x variable
+
+    other auxiliary variables appear only in the Rosenberg decomposition, at the
+    minimum their contribution to the energy vanishes, so they can be pruned
+
+    track -- track_blocks of the Problem, computed if not given
+    """
+    if track is None:
+        track = track_blocks(Problem, timing)
+    masks = [np.zeros((Problem.d_max + 1) ** 2, dtype=bool) for _ in z_blocks(Problem.trains_paths)]
+    for (_, bz), P in track.items():
+        masks[bz] |= np.any(P != 0, axis=0)
+    return masks
+
+
+def qubo_index(Problem, prune_z=False):
+    """returns QuboIndex of columns of make_Qubo_vectorized(Problem, prune_z=prune_z)
+
+    if prune_z, track occupation blocks evaluated for pruning are kept in
+    index.track_blocks and reused by the build
+    """
+    if not prune_z and getattr(Problem, "index", None) is not None:
+        return Problem.index
+    if not prune_z:
+        return QuboIndex(Problem.trains_paths, Problem.d_max)
+    track = track_blocks(Problem)
+    return QuboIndex(Problem.trains_paths, Problem.d_max, z_active=active_z(Problem, track=track),
+                     track_blocks=track)
+
+
+def _rosenberg_xx_mask(j, s, j1, index):
+    """ mask of x vs x Rosenberg terms of (j, s) and (j1, s) blocks the auxiliary
+    variables of which are not pruned, or None if nothing is pruned
+    """
+    n = index.d_max + 1
+    for z_block, transposed in (((s, j, j1), False), ((s, j1, j), True)):
+        if z_block in index.z_block_id:
+            mask = index.z_active[index.z_block_id[z_block]].reshape(n, n)
+            if np.all(mask):
+                return None
+            return mask.T if transposed else mask
+    return None
+
+
+def xx_block(b, b1, Problem, index, timing):
+    """ returns weighted contribution to Qmat at the pair of blocks b, b1 of x
+    variables (soft penalties, pairwise conditions and Rosenberg decomposition)
+    or None if blocks do not interact, index is QuboIndex
+
+    If auxiliary variables are pruned in index, their Rosenberg terms are omitted.
+    """
+    (j, s), (j1, s1) = index.blocks[b], index.blocks[b1]
+    J = get_block_coupling(index.blocks[b], index.blocks[b1], Problem, timing)
+    if b == b1:
+        J = J + np.diag(penalty_block(j, s, timing, Problem))
+    R = rosenberg_xx_block(j, s, j1, s1, Problem.trains_paths, Problem.d_max)
+    if R is not None:
+        mask = _rosenberg_xx_mask(j, s, j1, index)
+        if mask is not None:
+            R = R * mask
+        J = Problem.p_qubic * R if J is None else J + Problem.p_qubic * R
+    return J
+
+
+def xz_block(b, bz, Problem, index, timing):
+    """ returns weighted contribution to Qmat at the pair of block b of x variables
+    and block bz of (not pruned) auxiliary variables or None if blocks do not interact
+    """
+    if index.track_blocks is None:
+        J = get_block_z_coupling(index.blocks[b], index.blocks_z[bz], Problem, timing)
+    else:
+        J = _z_coupling(index.blocks[b], index.blocks_z[bz], index.track_blocks.get((b, bz)), Problem)
+    if J is None:
+        return None
+    return J[:, index.z_active[bz]]
+
+
+def qubo_couplers(Problem, index, timing=None, triangular=False):
+    """yields non-zero entries of symmetric Q matrix as triplets of arrays
+    (rows, columns, values), block by block
+
+    index is QuboIndex of Problem variables, timing is TimingModel (compiled
+    from Problem if not given). Blocks do not overlap, each entry is yielded
+    once and its value is summed in the same order as in make_Qubo.
+
+    triangular -- if True only the upper triangle is evaluated, with doubled
+    off-diagonal entries, see upper_triangular
+    """
+    if timing is None:
+        timing = problem_timing(Problem)
+    yield from _pairs_couplers(Problem, index, timing, *problem_pairs(Problem), triangular)
+    # z vs z, diagonal
+    for bz in range(len(index.blocks_z)):
+        yield z_diagonal(bz, Problem, index)
+
+
+def _pairs_couplers(Problem, index, timing, pairs, z_pairs, triangular=False):
+    """ yields triplets of entries of given pairs of x blocks and of x and z blocks """
+    x0, z0 = index.x_offsets, index.z_offsets
+    # soft panalties (objective), quadratic headway, minimal stay, single_line,
+    # circulation, switch and Rosenberg decomposition for x vs x
+    for b, b1 in pairs:
+        if triangular and b > b1:
+            continue
+        J = xx_block(b, b1, Problem, index, timing)
+        if J is not None:
+            if triangular:
+                # x + x is exactly 2 x
+                J = np.triu(J) + np.triu(J, 1) if b == b1 else J + J
+            yield _triplets(x0[b], x0[b1], J)
+    # qubic track occupancy condition, x vs z and z vs x
+    for b, bz in z_pairs:
+        J = xz_block(b, bz, Problem, index, timing)
+        if J is not None:
+            if triangular:
+                yield _triplets(x0[b], z0[bz], J + J)
+            else:
+                yield _triplets(x0[b], z0[bz], J)
+                yield _triplets(z0[bz], x0[b], J.T)
+
+
+def _concatenated(triplets):
+    """ concatenates vector of triplets of arrays (rows, columns, values) """
+    if not triplets:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+    return tuple(np.concatenate(x) for x in zip(*triplets))
+
+
+def _chunk_triplets(Problem, index, timing, pairs, z_pairs, triangular):
+    """ concatenated triplets of given pairs of blocks, run by worker processes """
+    return _concatenated(list(_pairs_couplers(Problem, index, timing, pairs, z_pairs, triangular)))
+
+
+def z_diagonal(bz, Problem, index):
+    """ returns Rosenberg decomposition entries of the diagonal of Qmat at the
+    block bz of (not pruned) auxiliary variables, as (rows, columns, values)
+    """
+    z = index.z_offsets[bz] + np.arange(np.count_nonzero(index.z_active[bz]))
+    return z, z, np.full(len(z), Problem.p_qubic * 3.0)
+
+
+def qubo_triplets(Problem, index, workers=None, triangular=False):
+    """ returns concatenated rows, columns and values of all non-zero entries
+    of symmetric Q matrix (or of its upper triangle), see qubo_couplers
+
+    workers -- if more than 1, pairs of blocks are split in chunks evaluated in
+    the pool of processes, results are merged in the order of chunks so
+    that they are identical with the serial evaluation
+    """
+    if workers is None or workers <= 1:
+        return _concatenated(list(qubo_couplers(Problem, index, triangular=triangular)))
+
+    timing = problem_timing(Problem)
+    chunks = 4 * workers
+    pairs, z_pairs = (np.array_split(np.array(p, dtype=int).reshape(-1, 2), chunks) for p in problem_pairs(Problem))
+    empty = np.zeros((0, 2), dtype=int)
+    tasks = [(p, empty) for p in pairs] + [(empty, p) for p in z_pairs]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        triplets = list(executor.map(_chunk_triplets, *zip(*[(Problem, index, timing, p, zp, triangular)
+                                                             for p, zp in tasks])))
+    triplets += [z_diagonal(bz, Problem, index) for bz in range(len(index.blocks_z))]
+    return _concatenated(triplets)
+
+
+def upper_triangular(Q):
+    """returns the upper triangle of symmetric Q matrix (dense or scipy.sparse)
+    with doubled off-diagonal entries, v Q v^T is not changed
+    """
+    if scipy.sparse.issparse(Q):
+        return scipy.sparse.csr_matrix(scipy.sparse.triu(Q) + scipy.sparse.triu(Q, k=1))
+    Q = np.asarray(Q)
+    return np.triu(Q) + np.triu(Q, 1)
+
+
+def symmetric(U):
+    """ returns symmetric Q matrix of the upper triangular one (dense or
+    scipy.sparse), inverse of upper_triangular, halving is exact
+    """
+    if scipy.sparse.issparse(U):
+        return scipy.sparse.csr_matrix((U + U.T) / 2)
+    U = np.asarray(U)
+    return (U + U.T) / 2
+
+
+def qubo_dict(U, labels=None):
+    """ returns dimod QUBO dict {(u, v): bias} of the upper triangular matrix U,
+    variables are labeled by columns or by given labels
+    """
+    U = scipy.sparse.coo_matrix(U)
+    labels = range(U.shape[0]) if labels is None else labels
+    return {(labels[k], labels[l]): v for k, l, v in zip(U.row.tolist(), U.col.tolist(), U.data.tolist())}
+
+
+def hobo_terms(Problem, index=None):
+    """returns the higher order model of Problem without Rosenberg decomposition,
+    on x variables only (columns of index, QuboIndex)
+
+    - (rows, cols, vals) -- non-zero entries of symmetric quadratic part
+    - (i, i1, i2, vals) -- cubic terms of track occupation condition
+      vals * x[i] * x[i1] * x[i2], where x[i1] and x[i2] replace the auxiliary
+      variable z(j, j1, s, d, d1) of the quadratic model
+
+    the energy of x equals this of make_Qubo with z(j, j1, s, d, d1) = x(j, s, d) x(j1, s, d1)
+    """
+    trains_paths = Problem.trains_paths
+    d_max = Problem.d_max
+    n = d_max + 1
+    if index is None:
+        index = qubo_index(Problem)
+    blocks, blocks_z = index.blocks, index.blocks_z
+    x0 = index.x_offsets
+    position = {block: b for b, block in enumerate(blocks)}
+    timing = problem_timing(Problem)
+    pairs, z_pairs = problem_pairs(Problem)
+
+    quadratic = []
+    for b, b1 in pairs:
+        J = get_block_coupling(blocks[b], blocks[b1], Problem, timing)
+        if b == b1:
+            J = J + np.diag(penalty_block(*blocks[b], timing, Problem))
+        if J is not None:
+            quadratic.append(_triplets(x0[b], x0[b1], J))
+
+    cubic = []
+    for b, bz in z_pairs:
+        (jx, sx), (sz, jz, jz1) = blocks[b], blocks_z[bz]
+        if (jz, sz) not in position or (jz1, sz) not in position:
+            # z is then free, and vanishes at the minimum
+            continue
+        P = track_occupation_block(jx, sx, sz, jz, jz1, timing, trains_paths, d_max)
+        if P is None:
+            continue
+        r, c = np.nonzero(P)
+        # Q[x][z] and Q[z][x] both contribute to the energy
+        cubic.append((x0[b] + r, x0[position[(jz, sz)]] + c // n, x0[position[(jz1, sz)]] + c % n,
+                      2 * Problem.p_pair * P[r, c]))
+
+    def concatenated(parts, k):
+        if not parts:
+            return tuple(np.zeros(0, dtype=int) for _ in range(k - 1)) + (np.zeros(0),)
+        return tuple(np.concatenate(x) for x in zip(*parts))
+
+    return concatenated(quadratic, 3), concatenated(cubic, 4)
+
+
+def make_Qubo_vectorized(Problem, format="dense", prune_z=False, workers=None, triangular=False,  # pylint: disable=redefined-builtin
+                         dtype=np.float64):
+    """returns symmetric Q matrix for the particular problem encoded in
+    Problem.trains_paths and Problem.trains_timing
+
+    The result is bit-identical with make_Qubo, but constrains are evaluated
+    on blocks of delays.
+
+    Parameters
+    Problem.dmax -- maximal secondary delay
+    Problem.p_sum -- panalty for ∑_i x_i = 1 hard constrains
+    Problem.p_pair -- penalty for ∑_i,j x_i x_j = 0 hard constrains
+    Problem.p_qubic -- weight for Rosenberg decomposition of qubic term
+    format -- "dense" returns numpy array, "sparse" returns scipy.sparse
+    csr_matrix, the memory of which scales with the number of couplers
+    prune_z -- if True auxiliary variables that do not enter track occupation
+    condition are removed together with their Rosenberg terms, columns of the
+    result are then given by qubo_index(Problem, prune_z=True)
+    workers -- number of processes of parallel build, see qubo_triplets, the
+    result is identical with the serial build
+    triangular -- if True only the upper triangle with doubled off-diagonal
+    entries is computed and stored, see upper_triangular and symmetric
+    dtype -- dtype of entries, e.g. np.float32 halves the memory, coefficients
+    are computed in float64 and rounded once; for integer entries see integer_scaled
+    """
+    index = qubo_index(Problem, prune_z)
+    size = len(index)
+
+    if format == "dense":
+        Q = np.zeros((size, size), dtype=dtype)
+        if workers is None or workers <= 1:
+            for rows, cols, vals in qubo_couplers(Problem, index, triangular=triangular):
+                Q[rows, cols] = vals
+        else:
+            rows, cols, vals = qubo_triplets(Problem, index, workers, triangular)
+            Q[rows, cols] = vals
+        return Q
+
+    if format == "sparse":
+        rows, cols, vals = qubo_triplets(Problem, index, workers, triangular)
+        # entries do not repeat, so no summation of duplicates is performed
+        return scipy.sparse.csr_matrix((vals.astype(dtype), (rows, cols)), shape=(size, size))
+
+    raise ValueError(f"unknown format {format}, use 'dense' or 'sparse'")
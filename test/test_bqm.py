@@ -0,0 +1,62 @@
+""" test dimod binary quadratic model """
+import numpy as np
+import dimod
+from railway_solvers import make_bqm, make_hobo, make_Qubo, energy, qubo_index
+
+
+def test_bqm():
+    """ biases and energies agree with Q matrix """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    bqm = make_bqm(Problem)
+    Q = make_Qubo(Problem)
+    reference = dimod.BinaryQuadraticModel(np.array(Q), "BINARY")
+
+    assert bqm.vartype == dimod.BINARY
+    assert bqm.num_variables == len(Q)
+    assert bqm.num_interactions == reference.num_interactions
+    assert bqm.linear[("x", 21, "A", 0)] == Q[0][0]
+    assert bqm.quadratic[(("x", 21, "A", 0), ("x", 21, "A", 1))] == Q[0][1] + Q[1][0]
+
+    sol = (np.load("test/files/solution_5trains.npz") + 1) // 2
+    index = qubo_index(Problem)
+    sample = {index.label(k): v for k, v in enumerate(sol)}
+    assert np.isclose(bqm.energy(sample), energy(sol, Q))
+
+
+def test_bqm_pruned():
+    """ pruned model has less variables, labels are kept """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    bqm = make_bqm(Problem, prune_z = True)
+    index = qubo_index(Problem, prune_z = True)
+
+    assert bqm.num_variables == len(index) < make_bqm(Problem).num_variables
+    assert list(bqm.variables) == [index.label(k) for k in range(len(index))]
+
+
+def test_hobo():
+    """ energy of higher order model equals this of Q matrix with z = x x """
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers import hobo_terms
+
+    Problem = Problem_of_5_trains()
+    hobo = make_hobo(Problem)
+    Q = make_Qubo(Problem)
+    index = qubo_index(Problem)
+
+    assert hobo.degree == 3
+    assert len(hobo.variables) == index.q_bits
+    assert len(hobo_terms(Problem)[1][0]) == sum(len(term) == 3 for term in hobo)
+
+    def x_of(k, j, d):
+        return index.x(index.trains[j], index.stations[index.station[k]], d)
+
+    rng = np.random.default_rng(0)
+    for x in [np.ones(index.q_bits)] + [rng.integers(2, size = index.q_bits) for _ in range(5)]:
+        z = [x[x_of(k, index.train[k], index.delay[k])] * x[x_of(k, index.train1[k], index.delay1[k])]
+             for k in range(index.q_bits, len(index))]
+        sample = {index.label(k): x[k] for k in range(index.q_bits)}
+        assert np.isclose(hobo.energy(sample), energy(np.concatenate([x, z]), Q))
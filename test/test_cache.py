@@ -0,0 +1,45 @@
+""" test on-disk cache of Q matrices """
+import os
+import numpy as np
+from railway_solvers import QuboCache, problem_key, make_Qubo
+
+
+def test_problem_key():
+    """ keys are canonical and depend on the content of the Problem """
+    from inputs.DW_example import DWave_problem
+
+    Problem = DWave_problem()
+    assert problem_key(Problem) == problem_key(DWave_problem())
+    assert problem_key(Problem) != problem_key(DWave_problem(rerouted = True))
+    assert problem_key(Problem) != problem_key(DWave_problem(soft_constrains = False))
+    assert problem_key(Problem) != problem_key(Problem, prune_z = True)
+
+    # the order of dict items does not matter
+    reordered = DWave_problem()
+    reordered.trains_timing = dict(reversed(list(Problem.trains_timing.items())))
+    assert problem_key(reordered) == problem_key(Problem)
+
+    Problem.p_pair = 2.0
+    assert problem_key(Problem) != problem_key(DWave_problem())
+
+
+def test_qubo_cache(tmp_path):
+    """ Q and labels are read from the cache, least recently used are evicted """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    cache = QuboCache(tmp_path)
+    Problem = Problem_of_5_trains()
+    Q, labels = cache.qubo(Problem)
+    assert np.array_equal(Q.toarray(), make_Qubo(Problem))
+    assert labels[0] == ("x", 21, "A", 0)
+
+    Q_cached, labels_cached = cache.get(problem_key(Problem))
+    assert labels_cached == labels
+    assert (Q_cached != Q).nnz == 0
+
+    # the limit allows a single entry
+    size = os.path.getsize(tmp_path / f"{problem_key(Problem)}.npz")
+    cache.max_bytes = size
+    cache.qubo(DWave_problem())
+    assert cache.get(problem_key(Problem)) is None
+    assert cache.get(problem_key(DWave_problem())) is not None
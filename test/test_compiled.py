@@ -0,0 +1,74 @@
+""" test compiled and validated Problem """
+import copy
+import numpy as np
+import pytest
+from railway_solvers import compile_problem, validate_problem, make_Qubo, make_Qubo_vectorized
+from railway_solvers import earliest_dep_times, qubo_terms, combine_terms, problem_key
+
+
+def test_compile_problem():
+    """ compiled Problem is reused by builders and gives the same Q """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    for Problem in [DWave_problem(rerouted = True), Problem_of_5_trains()]:
+        assert validate_problem(Problem) == []
+        compiled = compile_problem(Problem)
+
+        assert np.array_equal(make_Qubo_vectorized(compiled), make_Qubo(Problem))
+        terms = qubo_terms(compiled)
+        Q = combine_terms(terms, compiled.p_sum, compiled.p_pair, compiled.p_qubic)
+        assert np.array_equal(Q.toarray(), make_Qubo(Problem))
+        assert compiled.dep_times == earliest_dep_times(Problem.trains_paths, Problem.trains_timing)
+
+    with pytest.raises(AttributeError):
+        compiled.p_sum = 1.0
+    with pytest.raises(ValueError):
+        compiled.timing.dep_time[0, 0] = 1.0
+    # the compiled Problem does not follow changes of the input
+    Problem.trains_timing["initial_conditions"]["21_A"] = 10
+    assert compiled.trains_timing["initial_conditions"]["21_A"] == 6
+
+    # nested inputs are read-only, so the cache key follows the compiled Q
+    key = problem_key(compiled)
+    with pytest.raises(TypeError):
+        compiled.trains_timing["initial_conditions"]["21_A"] = 20
+    with pytest.raises(TypeError):
+        compiled.trains_paths["Jtrack"]["C"].append([21, 22])
+    assert problem_key(compiled) == key
+    Problem.trains_timing["initial_conditions"]["21_A"] = 6
+    assert problem_key(Problem) == key
+    # copies are plain and can be changed
+    trains_timing = copy.deepcopy(compiled.trains_timing)
+    trains_timing["initial_conditions"]["21_A"] = 20
+
+
+def test_validate_problem():
+    """ all errors are reported up front """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    Problem.trains_timing["tau"]["pass"].pop("21_A_B")
+    Problem.trains_timing["tau"]["pass"].pop("22_A_B")
+    errors = validate_problem(Problem)
+    assert len(errors) == 2
+    assert "'21_A_B'" in errors[0] and "'22_A_B'" in errors[1]
+
+    Problem = Problem_of_5_trains()
+    Problem.trains_timing["tau"]["headway"].pop("21_22_A_B")
+    Problem.trains_timing["tau"]["prep"].pop("23_C")
+    Problem.trains_paths["Jtrack"]["C"].append([21, 99])
+    assert validate_problem(Problem) == ["train 99 in Jtrack['C'] has no path"]
+    Problem.trains_paths["Jtrack"]["C"].pop()
+
+    errors = validate_problem(Problem)
+    assert "missing headway 21_22_A_B for headway condition of 21 at A and 22 at A" in errors
+    assert "missing prep 23_C for rolling_stock condition of 22 at B and 23 at C" in errors
+    with pytest.raises(ValueError, match = "invalid Problem"):
+        compile_problem(Problem)
+
+    Problem.d_max = -1
+    assert "d_max should be non-negative integer, not -1" in validate_problem(Problem)
+
+    Problem = Problem_of_5_trains()
+    Problem.trains_paths.pop("Jround")
+    assert validate_problem(Problem) == ["missing trains_paths['Jround'], required by the track occupation condition of Jtrack"]
@@ -0,0 +1,78 @@
+""" test feasibility checked directly on timetables """
+import numpy as np
+from railway_solvers import make_Qubo, energies, feasibility_offset, qubo_index
+from railway_solvers import feasible, constraint_violations, decoded_delays, FEASIBILITY_FAMILIES
+
+
+def test_feasible_solution():
+    """ recorded solution of 5 trains problem satisfies all hard constrains """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    sol = np.load("test/files/solution_5trains.npz")
+    counts = constraint_violations(sol, Problem, check_z = True)
+    assert list(counts) == FEASIBILITY_FAMILIES
+    assert all(c[0] == 0 for c in counts.values())
+    assert feasible(sol, Problem, check_z = True)[0]
+
+    index = qubo_index(Problem)
+    delays = decoded_delays(sol, index)
+    x = (sol + 1) // 2
+    assert np.all(delays >= 0)
+    for b, (j, s) in enumerate(index.blocks):
+        assert x[index.x(j, s, delays[0, b])] == 1
+
+    # ∑_i x_i = 1 is violated if the delay is changed without removing the old one
+    y = np.array(x)
+    j, s = index.blocks[0]
+    y[index.x(j, s, (delays[0, 0] + 1) % (Problem.d_max + 1))] = 1
+    assert decoded_delays(y, index)[0, 0] == -1
+    assert constraint_violations(y, Problem)["sum"][0] == 1
+    assert not feasible(y, Problem)[0]
+
+
+def test_feasible_as_energy():
+    """ feasibility of perturbed samples is as of the energy check """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    for make in [DWave_problem, Problem_of_5_trains]:
+        Problem = make()
+        Q_only_hard = make_Qubo(make(soft_constrains = False), format = "sparse")
+        x = (np.load("test/files/solution_5trains.npz") + 1) // 2 if make is Problem_of_5_trains else None
+        rng = np.random.default_rng(0)
+        size = Q_only_hard.shape[0]
+        if x is None:
+            samples = rng.integers(0, 2, (200, size))
+        else:
+            samples = np.tile(x, (200, 1))
+            flips = rng.random(samples.shape) < 0.003
+            samples[flips] = 1 - samples[flips]
+        offset = feasibility_offset(Problem.trains_paths, Problem.p_sum)
+        expected = energies(samples, Q_only_hard) <= offset + 0.00001
+        assert np.array_equal(feasible(samples, Problem, check_z = True), expected)
+        assert np.all(feasible(samples, Problem) >= expected)
+
+
+def test_violation_report():
+    """ offending variables are listed for each violation """
+    import collections
+    from inputs.DW_example import DWave_problem
+    from railway_solvers import violation_report, compile_problem
+
+    Problem = compile_problem(DWave_problem(rerouted = True))
+    samples = np.random.default_rng(0).integers(0, 2, (20, len(Problem.index)))
+    counts, violations = violation_report(samples, Problem, check_z = True)
+
+    expected = constraint_violations(samples, Problem, check_z = True)
+    assert all(np.array_equal(counts[family], expected[family]) for family in FEASIBILITY_FAMILIES)
+    listed = collections.Counter((k, family) for k, family, _ in violations)
+    assert all(counts[family][k] == listed[(k, family)] for family in counts for k in range(20))
+    assert [k for k, _, _ in violations] == sorted(k for k, _, _ in violations)
+
+    for k, family, variables in violations:
+        if family == "rosenberg":
+            assert len(variables) == 2
+        else:
+            # x variables of violated conditions are set
+            assert all(samples[k, Problem.index.x(j, s, d)] == 1 for j, s, d in variables)
+    assert {len(v) for _, family, v in violations if family == "track_occupation"} == {3}
@@ -1,8 +1,10 @@
 """ test helpers """
+import numpy as np
 from railway_solvers import skip_station, not_the_same_rolling_stock, penalty_weights
 from railway_solvers import subsequent_station, previous_station, occurs_as_pair, earliest_dep_time
 from railway_solvers import tau, departure_station4switches, previous_train_from_Jround
-from railway_solvers import energy
+from railway_solvers import energy, earliest_dep_times
+import pytest
 
 
 def test_pairs():
@@ -58,6 +60,25 @@ def test_auxiliary_trains_timing_functions():
     assert earliest_dep_time(S, trains_timing, 2, 0) == 19
     assert earliest_dep_time(S, trains_timing, 2, 1) == 8
 
+    trains_paths = {"Paths": S, "J": [0, 1, 2]}
+    dep_times = earliest_dep_times(trains_paths, trains_timing)
+    assert dep_times == {(0, 0): 4, (0, 1): 10, (1, 0): 1, (1, 1): 10, (2, 1): 8, (2, 0): 19}
+
+    # no initial conditions for train 2
+    trains_timing["initial_conditions"].pop("2_1")
+    with pytest.raises(ValueError):
+        earliest_dep_times(trains_paths, trains_timing)
+    # skipping station 1 does not help, departure from 0 follows from it
+    trains_paths["skip_station"] = {2: 1}
+    with pytest.raises(ValueError):
+        earliest_dep_times(trains_paths, trains_timing)
+    trains_paths["J"] = [0, 1]
+    assert len(earliest_dep_times(trains_paths, trains_timing)) == 4
+
+    trains_paths = {"Paths": {0: [0, 1, 0]}, "J": [0]}
+    with pytest.raises(ValueError):
+        earliest_dep_times(trains_paths, trains_timing)
+
 
 def test_helpers_of_trains_paths():
     """ test helpers for particular features of trains path or relations"""
@@ -84,3 +105,19 @@ def test_energy_computation():
     v = [-1, 1, 1]
     Q = [[1. for _ in range(3)] for _ in range(3)]
     assert energy(v, Q) == 4.
+
+
+def test_energies():
+    """ batched energies of samples """
+    import scipy.sparse
+    from railway_solvers import energies, qubo_matrix
+    Q = [[1., -2., 0.], [-2., 3., 1.], [0., 1., -1.]]
+    samples = np.array([[1, 1, 0], [0, 1, 1], [1, 0, 1], [0, 0, 0]])
+    expected = [energy(v, Q) for v in samples]
+    assert np.allclose(energies(samples, Q), expected)
+    assert np.allclose(energies(2 * samples - 1, Q), expected)
+    assert np.allclose(energies(samples, scipy.sparse.coo_matrix(Q)), expected)
+    X = qubo_matrix(scipy.sparse.coo_matrix(Q))
+    assert scipy.sparse.isspmatrix_csr(X)
+    assert qubo_matrix(X) is X
+    assert np.allclose(energies(samples[0], X), expected[:1])
@@ -0,0 +1,94 @@
+""" test persistent QUBO builder """
+import copy
+import numpy as np
+from railway_solvers import QuboBuilder, make_Qubo
+
+
+def test_builder_update():
+    """ updated Q matrix is identical with the one created from scratch """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    builder = QuboBuilder(Problem)
+    Q = builder.qubo()
+    assert np.array_equal(Q, make_Qubo(Problem))
+
+    rows, cols, vals = builder.update(initial_conditions = {"21_A": 9}, penalty_weights = {"24_C": 3.0})
+
+    Problem_updated = copy.deepcopy(Problem)
+    Problem_updated.trains_timing["initial_conditions"]["21_A"] = 9
+    Problem_updated.trains_timing["penalty_weights"]["24_C"] = 3.0
+    Q_updated = make_Qubo(Problem_updated)
+
+    assert np.array_equal(builder.qubo(), Q_updated)
+    assert np.array_equal(builder.qubo("sparse").toarray(), Q_updated)
+    # only blocks of the train 21 and the diagonal of (24, "C") are recomputed
+    assert len(rows) < Q.size / 2
+    Q[rows, cols] = vals
+    assert np.array_equal(Q, Q_updated)
+    # the Problem passed to the builder is not changed
+    assert Problem.trains_timing["initial_conditions"]["21_A"] != 9
+
+
+def test_builder_remove_add_train():
+    """ removing and adding trains gives Q of the changed Problem, labels are stable """
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers import trains_paths_without
+
+    Problem = Problem_of_5_trains()
+    builder = QuboBuilder(Problem)
+    labels = {builder.index.label(k) for k in range(len(builder.index))}
+
+    # 22 shares rolling stock with 23
+    builder.remove_train(22)
+    assert 22 not in trains_paths_without(Problem.trains_paths, 22)["Jtrack"]["C"][0]
+    assert trains_paths_without(Problem.trains_paths, 22)["Jround"]["C"] == []
+
+    Problem_removed = copy.copy(Problem)
+    Problem_removed.trains_paths = trains_paths_without(Problem.trains_paths, 22)
+    assert np.array_equal(builder.qubo(), make_Qubo(Problem_removed))
+    labels_removed = {builder.index.label(k) for k in range(len(builder.index))}
+    assert labels_removed < labels
+    assert all(label[1] != 22 and (label[0] == "x" or label[2] != 22) for label in labels_removed)
+
+    builder.add_train(22, Problem.trains_paths, Problem.trains_timing)
+    assert np.array_equal(builder.qubo(), make_Qubo(Problem))
+    assert {builder.index.label(k) for k in range(len(builder.index))} == labels
+    # the builder keeps its own copy of trains_paths
+    assert builder.Problem.trains_paths is not Problem.trains_paths
+    Problem.trains_paths["Jtrack"]["C"].append([22, 24])
+    assert [22, 24] not in builder.Problem.trains_paths["Jtrack"]["C"]
+
+
+def test_builder_of_compiled_problem():
+    """ compiled Problem can be passed to the builder, it is not changed by updates """
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers import compile_problem
+
+    Problem = Problem_of_5_trains()
+    compiled = compile_problem(Problem)
+    builder = QuboBuilder(compiled)
+    assert np.array_equal(builder.qubo(), make_Qubo(Problem))
+
+    builder.update(initial_conditions = {"21_A": 9})
+    Problem.trains_timing["initial_conditions"]["21_A"] = 9
+    assert np.array_equal(builder.qubo(), make_Qubo(Problem))
+    assert compiled.trains_timing["initial_conditions"]["21_A"] == 6
+
+
+def test_builder_add_train_with_changed_timing():
+    """ blocks of other trains with changed timing are recomputed when the train is added """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    builder = QuboBuilder(Problem)
+    builder.remove_train(22)
+
+    Problem.trains_timing["initial_conditions"]["21_A"] = 9
+    builder.add_train(22, Problem.trains_paths, Problem.trains_timing)
+    assert np.array_equal(builder.qubo(), make_Qubo(Problem))
+
+    builder.remove_train(22)
+    Problem.trains_timing["tau"]["pass"]["21_A_B"] += 1
+    builder.add_train(22, Problem.trains_paths, Problem.trains_timing)
+    assert np.array_equal(builder.qubo(), make_Qubo(Problem))
@@ -0,0 +1,63 @@
+""" test compact indexing of QUBO variables """
+import numpy as np
+from railway_solvers import QuboIndex, indexing4qubo, z_indices
+
+
+def test_qubo_index():
+    """ index agrees with indexing4qubo and z_indices """
+    from inputs.DW_example import Problem_of_5_trains
+
+    trains_paths = Problem_of_5_trains().trains_paths
+    index = QuboIndex(trains_paths, 10)
+
+    inds, q_bits = indexing4qubo(trains_paths, 10)
+    inds_z, q_bits_z = z_indices(trains_paths, 10)
+
+    assert index.q_bits == q_bits
+    assert index.q_bits_z == q_bits_z
+    assert len(index) == q_bits + q_bits_z
+    assert index.to_dicts() == inds + inds_z
+
+    for k, v in enumerate(inds):
+        assert index.x(v["j"], v["s"], v["d"]) == k
+    for k, v in enumerate(inds_z):
+        assert index.z(v["j"], v["j1"], v["s"], v["d"], v["d1"]) == q_bits + k
+
+    k = index.z(21, 24, "C", 3, 7)
+    assert index.label(k) == ("z", 21, 24, "C", 3, 7)
+    assert index.label(index.x(23, "B", 2)) == ("x", 23, "B", 2)
+
+    # vectorised index arithmetic
+    x = index.kind == 0
+    assert np.array_equal(index.delay[x], [v["d"] for v in inds])
+    assert np.all(index.train1[x] == -1)
+    assert np.array_equal(np.array(index.trains)[index.train1[~x]], [v["j1"] for v in inds_z])
+
+
+def test_qubo_index_pruned():
+    """ pruned auxiliary variables are skipped by the index """
+    from inputs.DW_example import Problem_of_5_trains
+    import pytest
+
+    trains_paths = Problem_of_5_trains().trains_paths
+    blocks_z = QuboIndex(trains_paths, 2).blocks_z
+    z_active = [np.ones(9, dtype=bool) for _ in blocks_z]
+    z_active[0][[0, 4]] = False
+    index = QuboIndex(trains_paths, 2, z_active=z_active)
+
+    s, j, j1 = blocks_z[0]
+    assert index.q_bits_z == 9 * len(blocks_z) - 2
+    assert index.z(j, j1, s, 0, 1) == index.q_bits
+    assert index.z(j, j1, s, 1, 2) == index.q_bits + 3
+    assert index.label(index.q_bits + 3) == ("z", j, j1, s, 1, 2)
+    assert index.z_offsets[1] == index.q_bits + 7
+    with pytest.raises(KeyError):
+        index.z(j, j1, s, 1, 1)
+    # delays out of range do not spill into neighbouring blocks or rows
+    j0, s0 = index.blocks[0]
+    with pytest.raises(KeyError):
+        index.x(j0, s0, 3)
+    with pytest.raises(KeyError):
+        index.x(j0, s0, -1)
+    with pytest.raises(KeyError):
+        index.z(j, j1, s, 0, 3)
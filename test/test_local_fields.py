@@ -0,0 +1,63 @@
+""" test local fields and flip deltas """
+import numpy as np
+import pytest
+from railway_solvers import make_Qubo, energy, LocalFields, qubo_index
+
+
+def test_flips_and_swaps():
+    """ deltas and incremental updates agree with the full energy """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    Q = make_Qubo(Problem, format = "sparse")
+    sol = np.load("test/files/solution_5trains.npz")
+    fields = LocalFields(Q, sol)
+    x = (sol + 1) // 2
+    assert fields.energy == pytest.approx(energy(x, Q))
+
+    rng = np.random.default_rng(0)
+    deltas = fields.flip_deltas()
+    for i in rng.integers(0, len(x), 20):
+        y = np.array(x)
+        y[i] = 1 - y[i]
+        assert fields.flip_delta(i) == pytest.approx(energy(y, Q) - energy(x, Q))
+        assert deltas[i] == pytest.approx(fields.flip_delta(i))
+
+    # move the delay of the train within the block
+    index = qubo_index(Problem)
+    j, s = index.blocks[0]
+    i = next(index.x(j, s, d) for d in range(Problem.d_max + 1) if x[index.x(j, s, d)] == 1)
+    k = index.x(j, s, 0) if i != index.x(j, s, 0) else index.x(j, s, 1)
+    y = np.array(x)
+    y[i], y[k] = y[k], y[i]
+    assert fields.swap_delta(i, k) == pytest.approx(energy(y, Q) - energy(x, Q))
+    assert fields.swap_delta(i, i) == 0.0
+
+    # random walk with incremental updates
+    for _ in range(200):
+        i, k = rng.integers(0, len(x), 2)
+        if rng.random() < 0.5:
+            fields.flip(i)
+        else:
+            fields.swap(i, k)
+    assert fields.energy == pytest.approx(energy(fields.v, Q))
+    assert np.allclose(fields.h, Q @ fields.v)
+
+    dense = LocalFields(np.array(make_Qubo(Problem)), fields.v)
+    assert dense.energy == pytest.approx(fields.energy)
+
+
+def test_upper_triangular():
+    """ upper triangular Q gives the same fields as the symmetric one """
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers import make_Qubo_vectorized
+
+    Problem = Problem_of_5_trains()
+    x = (np.load("test/files/solution_5trains.npz") + 1) // 2
+    fields = LocalFields(make_Qubo_vectorized(Problem, format = "sparse"), x)
+    fields_triangular = LocalFields(make_Qubo_vectorized(Problem, format = "sparse", triangular = True), x)
+    assert fields_triangular.energy == pytest.approx(fields.energy)
+    assert np.allclose(fields_triangular.flip_deltas(), fields.flip_deltas())
+    fields.flip(3)
+    fields_triangular.flip(3)
+    assert np.allclose(fields_triangular.h, fields.h)
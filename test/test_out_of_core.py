@@ -0,0 +1,31 @@
+""" test out-of-core Q matrix """
+import numpy as np
+import dimod
+from railway_solvers import write_Qubo, MappedQubo, make_Qubo, energy, energies, bqm_from_mapped
+
+
+def test_write_Qubo(tmp_path):
+    """ Q matrix streamed in small chunks is read back lazily """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    Q = np.array(make_Qubo(Problem))
+    mapped = write_Qubo(Problem, tmp_path / "Q", chunk_size = 100)
+
+    assert isinstance(mapped.vals, np.memmap)
+    assert mapped.shape == Q.shape
+    assert mapped.nnz == np.count_nonzero(Q)
+    assert np.array_equal(MappedQubo(tmp_path / "Q").to_sparse().toarray(), Q)
+    assert sum(len(rows) for rows, _, _ in mapped.chunks(1000)) == mapped.nnz
+
+    sol = np.load("test/files/solution_5trains.npz")
+    assert np.isclose(energy(sol, mapped), energy(sol, Q))
+    samples = np.random.default_rng(0).integers(0, 2, (10, len(Q)))
+    assert np.allclose(energies(samples, mapped), energies(samples, Q))
+    samples = np.random.default_rng(1).integers(0, 2, (150, len(Q)))
+    assert np.allclose(mapped.energies(samples, chunk_size = 6400), energies(samples, Q))
+
+    bqm = bqm_from_mapped(mapped, chunk_size = 500)
+    reference = dimod.BinaryQuadraticModel(Q, "BINARY")
+    x = (sol + 1) // 2
+    assert np.isclose(bqm.energy(dict(enumerate(x))), reference.energy(dict(enumerate(x))))
@@ -0,0 +1,46 @@
+""" test compact dtypes and integer scaled Q matrix """
+import numpy as np
+import pytest
+from railway_solvers import make_Qubo, make_Qubo_vectorized, integer_scaled, unscaled, energy
+
+
+def test_float32():
+    """ float32 Q is rounded float64 one """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    Q = np.array(make_Qubo(Problem))
+    Q32 = make_Qubo_vectorized(Problem, dtype = np.float32)
+    assert Q32.dtype == np.float32
+    assert np.array_equal(Q32, Q.astype(np.float32))
+    Q32 = make_Qubo_vectorized(Problem, format = "sparse", dtype = np.float32)
+    assert Q32.dtype == np.float32
+    assert np.array_equal(Q32.toarray(), Q.astype(np.float32))
+
+
+def test_integer_scaled():
+    """ integer Q with the scale reproduces Q and its energies """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    for Problem in [DWave_problem(rerouted = True), Problem_of_5_trains()]:
+        Q = np.array(make_Qubo(Problem))
+        Q_int, scale = integer_scaled(Q)
+        assert Q_int.dtype == np.int64
+        assert np.allclose(unscaled(Q_int, scale), Q, rtol = 0, atol = 1e-12)
+
+        Q_sparse, scale_sparse = integer_scaled(make_Qubo(Problem, format = "sparse"), dtype = np.int32)
+        assert scale_sparse == scale
+        assert Q_sparse.dtype == np.int32
+        assert np.array_equal(Q_sparse.toarray(), Q_int)
+
+        rng = np.random.default_rng(0)
+        for _ in range(5):
+            v = rng.integers(0, 2, len(Q))
+            e = v @ Q_int @ v
+            assert isinstance(e, np.integer)
+            assert e / scale == pytest.approx(energy(v, Q))
+
+    with pytest.raises(ValueError):
+        integer_scaled(np.array([[np.pi, 0.0], [0.0, 1.0]]), max_denominator = 10)
+    with pytest.raises(ValueError):
+        integer_scaled(np.array([[1e6, 0.5], [0.5, 1.0]]), dtype = np.int8)
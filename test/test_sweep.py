@@ -0,0 +1,27 @@
+""" test sweep of penalty weights """
+import numpy as np
+from railway_solvers import penalty_sweep, save_sweep, load_sweep
+
+
+def test_penalty_sweep(tmp_path):
+    """ table of feasibility and objectives over the grid of weights """
+    from inputs.DW_example import DWave_problem
+
+    Problem = DWave_problem()
+    table = penalty_sweep(Problem, [1.0, 2.5], [1.25], [2.1, 3.0], num_reads = 20, seed = 0, num_sweeps = 200)
+
+    assert np.array_equal(table["p_sum"], [1.0, 1.0, 2.5, 2.5])
+    assert np.array_equal(table["p_qubic"], [2.1, 3.0, 2.1, 3.0])
+    assert np.all((table["feasible_rate"] >= 0) & (table["feasible_rate"] <= 1))
+    # feasible solutions with the best objective are found for default weights
+    assert table["feasible_rate"][2] > 0
+    assert table["best_objective"][2] == table["best_energy"][2] + 12.5
+
+    save_sweep(table, tmp_path / "sweep.npz")
+    loaded = load_sweep(tmp_path / "sweep.npz")
+    assert all(np.array_equal(loaded[k], table[k], equal_nan = True) for k in table)
+
+    # terms are sent to workers once, results do not depend on the pool
+    parallel = penalty_sweep(Problem, [1.0, 2.5], [1.25], [2.1, 3.0], num_reads = 20, seed = 0, num_sweeps = 200,
+                             workers = 2)
+    assert all(np.array_equal(parallel[k], table[k], equal_nan = True) for k in table)
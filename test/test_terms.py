@@ -0,0 +1,29 @@
+""" test unweighted term matrices """
+import numpy as np
+from railway_solvers import make_Qubo, combine_terms, TERMS
+
+
+def test_terms():
+    """ combination of terms is identical with Q matrix """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    for Problem in [DWave_problem(rerouted = True), Problem_of_5_trains()]:
+        terms = make_Qubo(Problem, format = "terms")
+        assert list(terms) == list(TERMS)
+        Q = combine_terms(terms, Problem.p_sum, Problem.p_pair, Problem.p_qubic)
+        assert np.array_equal(Q.toarray(), make_Qubo(Problem))
+
+        # terms are symmetric and not weighted
+        for T in terms.values():
+            assert (T != T.T).nnz == 0
+        assert set(np.unique(terms["sum"].data)) == {-1.0, 1.0}
+        assert np.all(terms["switch"].data == 1.0)
+
+    # other weights
+    Problem.p_pair = 3.0
+    Q = combine_terms(terms, Problem.p_sum, 3.0, Problem.p_qubic)
+    assert np.array_equal(Q.toarray(), make_Qubo(Problem))
+
+    # empty selection of families
+    Q = combine_terms(terms, Problem.p_sum, 3.0, Problem.p_qubic, families = [])
+    assert Q.shape == terms["sum"].shape and Q.nnz == 0
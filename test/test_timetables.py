@@ -0,0 +1,44 @@
+""" test batch decoder of timetables """
+import numpy as np
+import pytest
+from railway_solvers import decode_timetables, save_timetables, load_timetables, TIMETABLE_COLUMNS
+from railway_solvers import make_Qubo, energy, indexing4qubo, earliest_dep_times, compile_problem
+
+
+def test_decode_timetables(tmp_path):
+    """ timetables of the batch of samples """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    sol = np.load("test/files/solution_5trains.npz")
+    x = (sol + 1) // 2
+    y = np.array(x)
+    y[:5] = 1 - y[:5]
+    table = decode_timetables([x, y], Problem)
+    assert list(table) == TIMETABLE_COLUMNS
+
+    inds, q_bits = indexing4qubo(Problem.trains_paths, Problem.d_max)
+    dep_times = earliest_dep_times(Problem.trains_paths, Problem.trains_timing)
+    expected = [(inds[i]["j"], inds[i]["s"], inds[i]["d"]) for i in range(q_bits) if x[i] == 1]
+    first = table["sample_id"] == 0
+    assert list(zip(table["train"][first], table["station"][first], table["delay"][first])) == expected
+    assert [t for t in table["departure_time"][first]] == [dep_times[(j, s)] + d for j, s, d in expected]
+    assert np.sum(table["sample_id"] == 1) == np.sum(y[:q_bits])
+
+    # soft constrains of the feasible solution
+    Q_objective = np.array(make_Qubo(Problem)) - np.array(make_Qubo(Problem_of_5_trains(soft_constrains = False)))
+    assert np.sum(table["objective"][first]) == pytest.approx(energy(x, Q_objective))
+
+    assert np.array_equal(decode_timetables([x], compile_problem(Problem))["objective"], table["objective"][first])
+
+    save_timetables(table, tmp_path / "timetables.npz")
+    loaded = load_timetables(tmp_path / "timetables.npz")
+    assert all(np.array_equal(loaded[c], table[c]) for c in TIMETABLE_COLUMNS)
+
+    save_timetables(table, tmp_path / "timetables.csv")
+    lines = (tmp_path / "timetables.csv").read_text().splitlines()
+    assert lines[0] == ",".join(TIMETABLE_COLUMNS)
+    assert len(lines) == len(table["sample_id"]) + 1
+
+    with pytest.raises(ValueError):
+        save_timetables(table, tmp_path / "timetables.txt")
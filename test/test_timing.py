@@ -0,0 +1,56 @@
+""" test compiled trains timing """
+import pytest
+import numpy as np
+from railway_solvers import TimingModel
+
+
+def test_timing_model():
+    """ time spans are indexed by integer ids of trains and stations """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    timing = TimingModel(Problem.trains_paths, Problem.trains_timing)
+
+    assert timing.trains == [21, 22, 23, 24, 25]
+    assert timing.stations == ["A", "B", "C", "D"]
+
+    j, s = timing.ids(22, "B")
+    assert timing.passing(j, s, timing.station_id["C"]) == 8
+    assert timing.stop(j, s) == 1
+    assert timing.dep(j, s) == 10
+    assert timing.weight[j, s] == 0.5
+    assert timing.headway(timing.train_id[21], j, s, timing.station_id["C"]) == 2
+    assert timing.reservation() == 1
+
+    j, s = timing.ids(23, "C")
+    assert timing.prep(j, s) == 3
+    assert np.isnan(timing.pass_time[timing.ids(25, "C")])
+
+    # missing time spans raise KeyError as the string keyed lookup
+    with pytest.raises(KeyError):
+        timing.passing(j, s, timing.station_id["D"])
+    with pytest.raises(KeyError):
+        timing.stop(j, s)
+    with pytest.raises(KeyError):
+        timing.headway(j, timing.train_id[21], s, timing.station_id["B"])
+    # unknown station is not mapped to another column
+    with pytest.raises(KeyError):
+        timing.ids(21, "X")
+
+
+def test_sets_of_trains_by_train():
+    """ switches and rolling stock are looked up by trains """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    timing = TimingModel(Problem.trains_paths, Problem.trains_timing)
+
+    assert timing.switches[frozenset((21, 22))] == [("B", {21: "out", 22: "out"}), ("B", {21: "in", 22: "in"})]
+    assert timing.switches[frozenset((24, 22))] == [("C", {22: "in", 24: "out"})]
+    assert frozenset((21, 23)) not in timing.switches
+    assert sum(len(v) for v in timing.switches.values()) == 7
+
+    assert timing.rolling_stock == {22: {23}, 23: {22}}
+    assert not timing.not_the_same_rolling_stock(23, 22)
+    assert timing.not_the_same_rolling_stock(21, 22)
+    assert timing.not_the_same_rolling_stock(22, 22)
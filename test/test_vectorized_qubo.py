@@ -0,0 +1,190 @@
+""" test vectorized QUBO creation against the reference implementation """
+import numpy as np
+from railway_solvers import make_Qubo, make_Qubo_vectorized, conflict_intervals, qubo_index
+from railway_solvers.timing import TimingModel
+from railway_solvers.vectorized_qubo import x_blocks, z_blocks, headway_block, track_occupation_block
+from railway_solvers.vectorized_qubo import interacting_blocks, interacting_z_blocks, band
+from railway_solvers.vectorized_qubo import get_block_coupling, get_block_z_coupling, rosenberg_xx_block
+
+
+def test_blocks():
+    """ blocks of variables follow the ordering of indexing4qubo and z_indices """
+    from inputs.DW_example import DWave_problem
+
+    Problem = DWave_problem(rerouted = False)
+
+    assert x_blocks(Problem.trains_paths) == [("j1", "S1"), ("j1", "S2"), ("j2", "S1"), ("j2", "S2"), ("j3", "S2")]
+    assert z_blocks(Problem.trains_paths) == [("S2", "j1", "j2")]
+
+    timing = TimingModel(Problem.trains_paths, Problem.trains_timing)
+    P = headway_block("j1", "S1", "j2", "S1", timing, Problem.trains_paths, Problem.d_max)
+    # j1 leaves S1 at 4 + d, j2 at 1 + d1, -6 < 1 + d1 - 4 - d < 2
+    assert P[0][0] == 1.
+    assert P[0][5] == 0.
+    assert P[2][0] == 1.
+    assert P[3][0] == 0.
+    assert headway_block("j1", "S1", "j2", "S2", timing, Problem.trains_paths, Problem.d_max) is None
+
+    P = track_occupation_block("j1", "S1", "S2", "j1", "j2", timing, Problem.trains_paths, Problem.d_max)
+    assert np.shape(P) == (11, 121)
+
+
+def test_vectorized_vs_reference():
+    """ Q matrices are bit-identical with these created by make_Qubo """
+    from inputs.DW_example import DWave_problem, DWave_problem_enlarged, Problem_of_5_trains
+
+    for Problem, f in [(DWave_problem(rerouted = False), "test/files/Qfile.npz"),
+                       (DWave_problem(rerouted = True), "test/files/Qfile_r.npz"),
+                       (DWave_problem_enlarged(), "test/files/Qfile_enlarged.npz"),
+                       (Problem_of_5_trains(), "test/files/Qfile_5trains.npz")]:
+
+        Q = make_Qubo_vectorized(Problem)
+        assert np.array_equal(Q, np.load(f)["Q"])
+        assert np.array_equal(Q, make_Qubo(Problem))
+
+    Problem = Problem_of_5_trains(soft_constrains = False)
+    assert np.array_equal(make_Qubo_vectorized(Problem), make_Qubo(Problem))
+
+
+def test_sparse_Qmat():
+    """ sparse Q matrix has the same entries as the dense one """
+    import scipy.sparse
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers import energy
+
+    Problem = Problem_of_5_trains()
+    Q = make_Qubo(Problem, format = "sparse")
+
+    assert scipy.sparse.issparse(Q)
+    assert np.array_equal(Q.toarray(), np.load("test/files/Qfile_5trains.npz")["Q"])
+    assert Q.nnz == np.count_nonzero(make_Qubo(Problem))
+
+    sol = np.load("test/files/solution_5trains.npz")
+    assert energy(sol, Q) == energy(sol, make_Qubo(Problem))
+
+
+def _min_over_z(Q, x, q_bits):
+    """ energy minimised over auxiliary variables, these couple only to x variables """
+    Qxx, Qxz, Qzz = Q[:q_bits, :q_bits], Q[:q_bits, q_bits:], np.diag(Q)[q_bits:]
+    return x @ Qxx @ x + np.sum(np.minimum(0, Qzz + 2 * x @ Qxz))
+
+
+def test_pruned_z():
+    """ pruning of auxiliary variables does not change energies minimised over them """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    rng = np.random.default_rng(0)
+    for Problem in [DWave_problem(rerouted = False), Problem_of_5_trains()]:
+        Q = make_Qubo_vectorized(Problem)
+        Q_pruned = make_Qubo_vectorized(Problem, prune_z = True)
+        index = qubo_index(Problem, prune_z = True)
+
+        assert len(index) == len(Q_pruned) <= len(Q)
+        assert np.array_equal(Q_pruned[:index.q_bits, index.q_bits:] != 0,
+                              Q_pruned[index.q_bits:, :index.q_bits].T != 0)
+
+        n = Problem.d_max + 1
+        for _ in range(20):
+            x = np.zeros(index.q_bits)
+            x[np.arange(0, index.q_bits, n) + rng.integers(n, size = len(index.blocks))] = 1
+            assert np.isclose(_min_over_z(Q, x, index.q_bits), _min_over_z(Q_pruned, x, index.q_bits))
+
+    # in the 5 trains example some auxiliary variables never couple
+    assert len(Q_pruned) < len(Q)
+    sol = (np.load("test/files/solution_5trains.npz")[:index.q_bits] + 1) / 2
+    assert np.isclose(_min_over_z(Q, sol, index.q_bits), _min_over_z(Q_pruned, sol, index.q_bits))
+
+
+def test_interacting_blocks():
+    """ candidate pairs of blocks include all pairs with non-zero couplings """
+    from inputs.DW_example import DWave_problem, Problem_of_5_trains
+
+    for Problem in [DWave_problem(rerouted = True), Problem_of_5_trains()]:
+        trains_paths = Problem.trains_paths
+        blocks = x_blocks(trains_paths)
+        blocks_z = z_blocks(trains_paths)
+
+        pairs = interacting_blocks(trains_paths)
+        z_pairs = interacting_z_blocks(trains_paths)
+        timing = TimingModel(trains_paths, Problem.trains_timing)
+        assert len(pairs) < len(blocks) ** 2
+
+        for b, block in enumerate(blocks):
+            for b1, block1 in enumerate(blocks):
+                J = get_block_coupling(block, block1, Problem, timing)
+                R = rosenberg_xx_block(*block, *block1, trains_paths, Problem.d_max)
+                if J is not None or R is not None:
+                    assert (b, b1) in pairs
+            for bz, z_block in enumerate(blocks_z):
+                if get_block_z_coupling(block, z_block, Problem, timing) is not None:
+                    assert (b, bz) in z_pairs
+
+
+def test_conflict_intervals():
+    """ pairwise conditions are penalised on bands of delay differences """
+    from inputs.DW_example import DWave_problem
+
+    P = band([(-2, 1)], 3)
+    assert np.array_equal(P, [[1., 0., 0., 0.], [1., 1., 0., 0.], [0., 1., 1., 0.], [0., 0., 1., 1.]])
+    assert band([], 3) is None
+
+    Problem = DWave_problem(rerouted = True)
+    conflicts = conflict_intervals(Problem)
+
+    single_track = [c for c in conflicts if c["condition"] == "single_track"]
+    # j2 leaves S1 at 1 + d, j3 leaves S2 at 8 + d1, both need 8 to pass the line
+    assert single_track == [{"condition": "single_track", "j": "j2", "s": "S1", "j1": "j3", "s1": "S2", "lo": -15., "hi": 1.}]
+
+    switches = [c for c in conflicts if c["condition"] == "switch" and c["j"] == "j2"]
+    assert [(c["lo"], c["hi"]) for c in switches] == [(-16., -14.), (0., 2.)]
+
+
+def test_parallel_build():
+    """ parallel build is identical with the serial one """
+    from inputs.DW_example import Problem_of_5_trains
+
+    Problem = Problem_of_5_trains()
+    Q = make_Qubo_vectorized(Problem, format = "sparse")
+    Q_parallel = make_Qubo_vectorized(Problem, format = "sparse", workers = 2)
+
+    assert np.array_equal(Q.indptr, Q_parallel.indptr)
+    assert np.array_equal(Q.indices, Q_parallel.indices)
+    assert np.array_equal(Q.data, Q_parallel.data)
+    assert np.array_equal(make_Qubo_vectorized(Problem, workers = 2), make_Qubo(Problem))
+
+
+def test_upper_triangular():
+    """ upper triangular Q converts losslessly to the symmetric one """
+    import dimod
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers import upper_triangular, symmetric, qubo_dict
+
+    Problem = Problem_of_5_trains()
+    Q = make_Qubo_vectorized(Problem)
+    U = make_Qubo_vectorized(Problem, triangular = True)
+
+    assert np.array_equal(U, np.triu(U))
+    assert np.count_nonzero(U) < np.count_nonzero(Q)
+    assert np.array_equal(U, upper_triangular(Q))
+    assert np.array_equal(symmetric(U), Q)
+
+    U_sparse = make_Qubo_vectorized(Problem, format = "sparse", triangular = True)
+    assert np.array_equal(U_sparse.toarray(), U)
+    assert np.array_equal(symmetric(U_sparse).toarray(), Q)
+
+    qubo, _ = dimod.BinaryQuadraticModel(Q, "BINARY").to_qubo()
+    assert {tuple(sorted(k)): v for k, v in qubo.items()} == qubo_dict(U)
+
+
+def test_pruned_index_lookups():
+    """ pruned index keeps track occupation blocks and z block ids for the build """
+    from inputs.DW_example import Problem_of_5_trains
+    from railway_solvers.vectorized_qubo import track_blocks
+
+    Problem = Problem_of_5_trains()
+    index = qubo_index(Problem, prune_z = True)
+    assert all(index.blocks_z[bz] == block for block, bz in index.z_block_id.items())
+    expected = track_blocks(Problem)
+    assert index.track_blocks.keys() == expected.keys()
+    assert all(np.array_equal(index.track_blocks[k], expected[k]) for k in expected)
+    assert qubo_index(Problem).track_blocks is None